@@ -4,6 +4,7 @@
 """
 
 import os
+import tempfile
 from typing import List
 from pydantic_settings import BaseSettings
 from pydantic import Field
@@ -47,12 +48,20 @@ class Settings(BaseSettings):
         default="shark_rf_model_round_18.joblib",
         description="機器學習模型檔案路徑"
     )
+    PREDICT_N_JOBS: int = Field(
+        default=-1,
+        description="大批次預測使用的執行緒數（-1 為所有核心；gunicorn 部署時依工作行程數平分）"
+    )
     
     # 海洋數據設定
     OCEAN_DATA_PATH: str = Field(
         default="comprehensive_shark_ocean_features - comprehensive_shark_ocean_features.csv",
         description="海洋數據 CSV 檔案路徑"
     )
+    DATA_CACHE_DIR: str = Field(
+        default=os.path.join(tempfile.gettempdir(), "nasa-backend-cache"),
+        description="數據快取目錄（存放由 CSV 產生的 Parquet 快取檔，不寫入原始碼目錄）"
+    )
     
     # 日誌設定
     LOG_LEVEL: str = Field(default="INFO", description="日誌等級")
@@ -0,0 +1,84 @@
+"""
+預測共用工具
+各 ML 路由共用的模型載入、預測與預測結果統計
+"""
+
+import os
+from typing import Any, Tuple
+
+# 大批次預測使用的執行緒數（-1 為所有核心）
+try:
+    from app.core.config import settings
+    PREDICT_N_JOBS = settings.PREDICT_N_JOBS
+except ImportError:
+    PREDICT_N_JOBS = int(os.getenv("PREDICT_N_JOBS", "-1"))
+
+# 使用 np.bincount 的最大類別值（避免類別值很大時配置過大的計數陣列）
+BINCOUNT_MAX_LABEL = 65535
+
+# 批次列數達到此值才平行預測，小批次改用單執行緒（執行緒分派的成本高於收益）
+PARALLEL_PREDICT_MIN_ROWS = 256
+
+
+def load_joblib_model(path: str) -> Any:
+    """
+    從磁碟載入 joblib 模型
+
+    模型檔案不存在時拋出 FileNotFoundError；未安裝 joblib 時拋出 ImportError
+    """
+    import joblib
+
+    model = joblib.load(path, mmap_mode='r')
+
+    # 清除訓練時保存的 n_jobs，改由每次預測的 prediction_parallelism() 決定平行度
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = None
+
+    return model
+
+
+def to_model_input(X: Any) -> Any:
+    """將特徵轉為 C 連續的 float32 陣列（樹模型內部以 float32 運算，預先轉換可省去模型內的複製）"""
+    import numpy as np
+
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def prediction_parallelism(n_rows: int) -> Any:
+    """
+    依批次列數回傳預測平行度的 context manager：大批次使用 PREDICT_N_JOBS 個執行緒，小批次單執行緒
+
+    設定只對目前執行緒有效，不修改多個請求共用的模型物件
+    """
+    from joblib import parallel_backend
+
+    n_jobs = PREDICT_N_JOBS if n_rows >= PARALLEL_PREDICT_MIN_ROWS else 1
+    return parallel_backend('threading', n_jobs=n_jobs)
+
+
+def predict_with_probabilities(model: Any, X: Any) -> Tuple[Any, Any]:
+    """執行預測，回傳 (預測值, 預測機率或 None)"""
+    with prediction_parallelism(len(X)):
+        if not hasattr(model, 'predict_proba'):
+            return model.predict(X), None
+
+        # 分類器只需計算一次機率，預測值取機率最大的類別（不必再走一次所有的樹）
+        probabilities = model.predict_proba(X)
+        return model.classes_[probabilities.argmax(axis=1)], probabilities
+
+
+def count_predictions(predictions: Any) -> Tuple[Any, Any]:
+    """
+    計算各預測值出現的次數，回傳 (排序後的唯一值, 對應次數)，結果與 np.unique(..., return_counts=True) 相同
+
+    分類結果為較小的非負整數時以 np.bincount 一次計數（O(n)，不需排序），其他情況退回 np.unique
+    """
+    import numpy as np
+
+    if (predictions.size and predictions.dtype.kind in 'iu'
+            and predictions.min() >= 0 and predictions.max() <= BINCOUNT_MAX_LABEL):
+        counts = np.bincount(predictions.astype(np.intp, copy=False))
+        values = np.flatnonzero(counts)
+        return values.astype(predictions.dtype, copy=False), counts[values]
+
+    return np.unique(predictions, return_counts=True)
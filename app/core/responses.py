@@ -0,0 +1,56 @@
+"""
+JSON 回應類別
+有安裝 orjson 時使用 C 實作的序列化，否則退回標準 json 模組
+
+FastAPI 會先以 jsonable_encoder 轉換端點回傳的 dict，而它無法處理 numpy 陣列；
+需要直接輸出陣列（不經 .tolist()）的端點應回傳 numpy_json_response(content)
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class NumpyORJSONResponse(ORJSONResponse):
+    """orjson 回應：可直接序列化 numpy 型別，並允許非字串鍵（例如預測分佈 {0: n, 1: m}）"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class NumpyJSONResponse(JSONResponse):
+    """標準 json 回應：遇到 numpy 陣列或純量時以 tolist() 轉換（未安裝 orjson 時使用）"""
+
+    def render(self, content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_numpy_default,
+        ).encode("utf-8")
+
+
+def _numpy_default(value: Any) -> Any:
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# 應用程式預設使用的回應類別
+DefaultJSONResponse = NumpyORJSONResponse if orjson is not None else NumpyJSONResponse
+
+
+def numpy_json_response(content: Any) -> JSONResponse:
+    """建立內容可包含 numpy 陣列與純量的 JSON 回應（端點直接回傳，略過 jsonable_encoder）"""
+    return DefaultJSONResponse(content)
@@ -0,0 +1,58 @@
+"""
+上傳檔案處理工具
+限制上傳檔案大小，避免過大的檔案耗盡記憶體
+"""
+
+import os
+
+from fastapi import HTTPException, UploadFile
+
+try:
+    from app.core.config import settings
+    MAX_UPLOAD_SIZE = settings.MAX_FILE_SIZE
+except ImportError:
+    MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+
+# 每次從上傳檔案讀取的位元組數
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"檔案過大，上限為 {max_size / (1024 * 1024):g} MB"
+    )
+
+
+def ensure_upload_size(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> None:
+    """檢查上傳檔案大小，超過上限時拋出 413（不讀取檔案內容）"""
+    size = getattr(file, "size", None)
+
+    if size is None:
+        # 舊版 Starlette 沒有 size 屬性：直接查詢暫存檔的長度
+        # （以 tell() 取得位置，Python 3.8 的 SpooledTemporaryFile.seek 回傳 None）
+        position = file.file.tell()
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(position)
+
+    if size > max_size:
+        raise _too_large(max_size)
+
+
+async def read_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> bytes:
+    """分塊讀取上傳檔案，累積大小超過上限時立即拋出 413"""
+    ensure_upload_size(file, max_size)
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        if len(buffer) + len(chunk) > max_size:
+            raise _too_large(max_size)
+
+        buffer.extend(chunk)
+
+    return bytes(buffer)
@@ -51,3 +51,23 @@ if ml_prediction_available:
         prefix="/ml",
         tags=["機器學習預測"]
     )
+
+
+def preload():
+    """預先載入各路由需要的模型與數據（由應用程式啟動時呼叫）"""
+    if ocean_data_available:
+        try:
+            ocean_data_simple.load_records_by_date()
+            ocean_data_simple.load_available_dates()
+            print("✅ 已預先載入海洋數據索引")
+        except Exception as e:
+            print(f"⚠️ 海洋數據預先載入失敗: {e}")
+    
+    if ml_prediction_available:
+        ml_prediction_advanced.preload_model()
+
+
+async def shutdown():
+    """停止各路由的背景工作（由應用程式關閉時呼叫）"""
+    if ml_prediction_available:
+        await ml_prediction_advanced.prediction_batcher.close()
@@ -4,14 +4,16 @@
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-import joblib
 import pandas as pd
 import numpy as np
 import io
 from typing import Dict, List, Any
 import os
 
+from app.core.predictions import count_predictions, load_joblib_model, predict_with_probabilities, to_model_input
+from app.core.responses import numpy_json_response
+from app.core.uploads import read_upload
+
 router = APIRouter()
 
 # 模型檔案路徑
@@ -29,7 +31,7 @@ def load_model():
             if not os.path.exists(MODEL_PATH):
                 raise FileNotFoundError(f"模型檔案不存在: {MODEL_PATH}")
             
-            _model = joblib.load(MODEL_PATH)
+            _model = load_joblib_model(MODEL_PATH)
             print(f"✅ 成功載入模型: {type(_model)}")
             
         except Exception as e:
@@ -77,7 +79,7 @@ async def predict_with_csv(file: UploadFile = File(...)):
             )
         
         # 讀取 CSV 檔案
-        contents = await file.read()
+        contents = await read_upload(file)
         csv_data = io.StringIO(contents.decode('utf-8'))
         df = pd.read_csv(csv_data)
         
@@ -91,16 +93,13 @@ async def predict_with_csv(file: UploadFile = File(...)):
         # 數據預處理
         df_processed = preprocess_data(df)
         
-        # 進行預測
-        predictions = model.predict(df_processed)
+        X = to_model_input(df_processed)
         
-        # 如果模型支援，也可以獲取預測機率
-        try:
-            prediction_proba = model.predict_proba(df_processed)
-            has_proba = True
-        except:
-            prediction_proba = None
-            has_proba = False
+        # 進行預測（分類器只計算一次機率，預測值取機率最大的類別）
+        predictions, prediction_proba = predict_with_probabilities(model, X)
+        
+        # 各預測值的數量（只計算一次，分佈與唯一值個數共用）
+        unique, counts = count_predictions(predictions)
         
         # 準備返回結果
         results = {
@@ -117,19 +116,18 @@ async def predict_with_csv(file: UploadFile = File(...)):
                 "model_path": MODEL_PATH
             },
             "predictions": {
-                "values": predictions.tolist(),
+                "values": predictions,
                 "count": len(predictions),
-                "unique_predictions": len(np.unique(predictions))
+                "unique_predictions": len(unique)
             }
         }
         
         # 如果有預測機率，加入結果
-        if has_proba:
-            results["predictions"]["probabilities"] = prediction_proba.tolist()
+        if prediction_proba is not None:
+            results["predictions"]["probabilities"] = prediction_proba
         
         # 添加統計信息
-        if len(np.unique(predictions)) <= 10:  # 分類問題
-            unique, counts = np.unique(predictions, return_counts=True)
+        if len(unique) <= 10:  # 分類問題
             results["predictions"]["distribution"] = dict(zip(unique.tolist(), counts.tolist()))
         else:  # 回歸問題
             results["predictions"]["statistics"] = {
@@ -140,7 +138,7 @@ async def predict_with_csv(file: UploadFile = File(...)):
                 "median": float(np.median(predictions))
             }
         
-        return results
+        return numpy_json_response(results)
         
     except Exception as e:
         print(f"❌ 預測失敗: {e}")
@@ -163,22 +161,23 @@ async def predict_with_csv_detailed(file: UploadFile = File(...)):
             )
         
         # 讀取 CSV 檔案
-        contents = await file.read()
+        contents = await read_upload(file)
         csv_data = io.StringIO(contents.decode('utf-8'))
         df = pd.read_csv(csv_data)
         
         # 載入模型並預測
         model = load_model()
         df_processed = preprocess_data(df)
-        predictions = model.predict(df_processed)
+        X = to_model_input(df_processed)
+        
+        predictions, prediction_proba = predict_with_probabilities(model, X)
         
         # 將預測結果加到原始數據中
         df_result = df.copy()
         df_result['prediction'] = predictions
         
-        # 嘗試獲取預測機率
-        try:
-            prediction_proba = model.predict_proba(df_processed)
+        # 添加預測機率
+        if prediction_proba is not None:
             # 如果是二分類，添加機率
             if prediction_proba.shape[1] == 2:
                 df_result['probability_class_0'] = prediction_proba[:, 0]
@@ -187,8 +186,6 @@ async def predict_with_csv_detailed(file: UploadFile = File(...)):
                 # 多分類，添加每個類別的機率
                 for i in range(prediction_proba.shape[1]):
                     df_result[f'probability_class_{i}'] = prediction_proba[:, i]
-        except:
-            pass
         
         # 轉換為字典格式返回
         result_data = df_result.to_dict('records')
@@ -3,17 +3,28 @@
 包含完整的數據工程流程
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
 from typing import Dict, List, Any, Optional
-import csv
+import asyncio
+import functools
 import io
 import os
 
+from app.core.predictions import count_predictions, load_joblib_model, predict_with_probabilities, to_model_input
+from app.core.responses import numpy_json_response
+from app.core.uploads import read_upload
+
 router = APIRouter()
 
 # 模型檔案路徑
 MODEL_PATH = "shark_rf_model_round_18.joblib"
 
+# ONNX 模型檔案路徑（可選，由 export_onnx_model.py 產生）
+ONNX_MODEL_PATH = "shark_rf_model_round_18.onnx"
+
+# 要求以二進位格式回傳預測結果時使用的 Accept 類型
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
 # 全域模型變數
 _model = None
 
@@ -26,8 +37,7 @@ def load_model():
             if not os.path.exists(MODEL_PATH):
                 raise FileNotFoundError(f"模型檔案不存在: {MODEL_PATH}")
             
-            import joblib
-            _model = joblib.load(MODEL_PATH)
+            _model = load_joblib_model(MODEL_PATH)
             print(f"✅ 模型載入成功: {type(_model).__name__}")
             return _model, None
             
@@ -38,6 +48,183 @@ def load_model():
     
     return _model, None
 
+@functools.lru_cache(maxsize=1)
+def load_onnx_session():
+    """載入 ONNX Runtime 推論工作階段；未安裝 onnxruntime、檔案不存在或比 joblib 模型舊時回傳 None"""
+    if not os.path.exists(ONNX_MODEL_PATH):
+        return None
+    
+    if os.path.exists(MODEL_PATH) and os.path.getmtime(ONNX_MODEL_PATH) < os.path.getmtime(MODEL_PATH):
+        print("⚠️ ONNX 模型比 joblib 模型舊，改用 scikit-learn 預測")
+        return None
+    
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+    
+    try:
+        session = onnxruntime.InferenceSession(ONNX_MODEL_PATH, providers=['CPUExecutionProvider'])
+        print(f"✅ ONNX 模型載入成功: {ONNX_MODEL_PATH}")
+        return session
+    except Exception as e:
+        print(f"⚠️ ONNX 模型載入失敗，改用 scikit-learn 預測: {e}")
+        return None
+
+def preload_model():
+    """預先載入模型（應用程式啟動時呼叫），避免第一個預測請求承擔載入成本"""
+    model, error = load_model()
+    if error:
+        print(f"⚠️ 模型預先載入失敗: {error}")
+    
+    load_onnx_session()
+
+def run_model_prediction(model, X) -> tuple:
+    """執行模型預測，回傳 (預測值, 預測機率或 None)"""
+    session = load_onnx_session() if hasattr(model, 'predict_proba') else None
+    if session is None:
+        return predict_with_probabilities(model, X)
+    
+    # ONNX Runtime 以編譯過的程式走訪所有樹，小批次時省去 scikit-learn 的 Python 開銷
+    probabilities = session.run(['probabilities'], {session.get_inputs()[0].name: X})[0]
+    predictions = model.classes_[probabilities.argmax(axis=1)]
+    
+    return predictions, probabilities
+
+def binary_prediction_response(model, predictions, probabilities) -> Response:
+    """
+    以二進位格式回傳預測結果
+    
+    內容為列優先的 little-endian float32 矩陣（有預測機率時為 N x 類別數，否則為 N x 1 的預測值），
+    形狀、型別與類別順序放在回應標頭中，省去逐元素轉成 JSON 的成本
+    """
+    import numpy as np
+    
+    values = probabilities if probabilities is not None else predictions.reshape(-1, 1)
+    values = np.ascontiguousarray(values, dtype='<f4')
+    
+    headers = {
+        "X-Shape": f"{values.shape[0]}x{values.shape[1]}",
+        "X-Dtype": "<f4",
+    }
+    if probabilities is not None and hasattr(model, 'classes_'):
+        headers["X-Classes"] = ",".join(str(value) for value in model.classes_.tolist())
+    
+    return Response(content=values.tobytes(), media_type=BINARY_MEDIA_TYPE, headers=headers)
+
+class PredictionBatcher:
+    """
+    預測微批次器
+    
+    將同時等待中的多個預測請求合併成一次 predict / predict_proba 呼叫，
+    並在執行緒池中執行，避免模型推論阻塞事件迴圈。
+    單獨的請求不額外等待；模型運算期間到達的請求會累積成下一個批次。
+    """
+    
+    def __init__(self, predict=run_model_prediction, max_rows: int = 100_000):
+        self.predict_fn = predict  # (model, X) -> (預測值, 預測機率或 None)
+        self.max_rows = max_rows  # 單一批次的最大列數
+        self._queue = None
+        self._loop = None
+        self._task = None
+    
+    async def predict(self, model, X) -> tuple:
+        """提交一個特徵矩陣，等待所屬批次完成後回傳 (預測值, 預測機率或 None)"""
+        loop = asyncio.get_running_loop()
+        
+        # 佇列與背景工作綁定在事件迴圈上，迴圈改變時（例如測試）重新建立
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._worker(self._queue))
+        
+        future = loop.create_future()
+        self._queue.put_nowait((model, X, future))
+        return await future
+    
+    async def close(self):
+        """停止背景工作（應用程式關閉時呼叫），尚未完成的請求會被取消"""
+        task = self._task
+        self._task = self._queue = self._loop = None
+        
+        if task is None or task.done():
+            return
+        
+        task.cancel()
+        if task.get_loop() is asyncio.get_running_loop():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _worker(self, queue: asyncio.Queue):
+        """背景工作：依到達順序收集批次、合併預測並把結果分配回各請求"""
+        pending = None  # 已取出但屬於其他模型的請求，下一批次最先處理（維持先到先處理）
+        batch = []
+        
+        try:
+            while True:
+                model, X, future = pending if pending is not None else await queue.get()
+                pending = None
+                batch = [(X, future)]
+                rows = len(X)
+                
+                # 合併已在佇列中等待、使用同一模型的請求
+                while rows < self.max_rows and not queue.empty():
+                    item = queue.get_nowait()
+                    if item[0] is not model:
+                        # 不同模型（例如重新載入後）不能合併，留到下一批次
+                        pending = item
+                        break
+                    
+                    batch.append((item[1], item[2]))
+                    rows += len(item[1])
+                
+                await self._run_batch(model, batch)
+                batch = []
+        finally:
+            # 背景工作被取消時，取消仍在等待結果的請求
+            waiting = [item_future for _, item_future in batch]
+            if pending is not None:
+                waiting.append(pending[2])
+            while not queue.empty():
+                waiting.append(queue.get_nowait()[2])
+            for item_future in waiting:
+                item_future.cancel()
+    
+    async def _run_batch(self, model, batch: list):
+        """執行一個批次的預測；合併的批次失敗時逐一重新預測，只讓造成錯誤的請求失敗"""
+        import numpy as np
+        
+        loop = asyncio.get_running_loop()
+        
+        try:
+            X_batch = batch[0][0] if len(batch) == 1 else np.vstack([item_X for item_X, _ in batch])
+            predictions, probabilities = await loop.run_in_executor(None, self.predict_fn, model, X_batch)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            
+            for item in batch:
+                await self._run_batch(model, [item])
+            return
+        
+        # 依各請求的列數切回結果
+        start = 0
+        for item_X, item_future in batch:
+            end = start + len(item_X)
+            if not item_future.done():
+                item_future.set_result((
+                    predictions[start:end],
+                    probabilities[start:end] if probabilities is not None else None,
+                ))
+            start = end
+
+# 全域預測批次器
+prediction_batcher = PredictionBatcher()
+
 def data_engineering_pipeline(csv_content: str) -> tuple:
     """
     完整的數據工程流程
@@ -48,14 +235,19 @@ def data_engineering_pipeline(csv_content: str) -> tuple:
     5. 數據標準化
     """
     try:
-        # 1. 解析 CSV
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        rows = list(csv_reader)
+        import numpy as np
+        import pandas as pd
         
-        if not rows:
+        # 1. 解析 CSV（由 pandas 的 C 解析器一次轉成欄位陣列）
+        try:
+            df = pd.read_csv(io.StringIO(csv_content))
+        except pd.errors.EmptyDataError:
+            return None, None, None, "CSV 檔案沒有數據"
+        
+        if df.empty:
             return None, None, None, "CSV 檔案沒有數據"
         
-        headers = list(rows[0].keys())
+        headers = df.columns.tolist()
         print(f"📋 原始欄位: {headers}")
         
         # 2. 特徵選擇 - 選擇對鯊魚預測有用的特徵
@@ -73,82 +265,47 @@ def data_engineering_pipeline(csv_content: str) -> tuple:
         available_features = [f for f in selected_features if f in headers]
         print(f"📊 可用特徵: {available_features}")
         
-        # 3. 數據清理和特徵工程
-        processed_data = []
-        labels = []  # 如果有標籤的話
+        # 3. 數據清理 - 無法轉換的值（空白、文字）與極端值都視為 0
+        data_array = df[available_features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        data_array = np.where(np.abs(data_array) <= 1e6, data_array, 0.0)
         
-        for row in rows:
-            # 提取特徵
-            feature_vector = []
-            
-            for feature in available_features:
-                value = row.get(feature, '0')
-                
-                # 處理特殊值
-                if feature in ['is_in_eddy']:
-                    # 布林值轉數值
-                    feature_vector.append(1.0 if value.lower() in ['true', '1', 'yes'] else 0.0)
-                elif feature == 'eddy_type':
-                    # 類別變數編碼
-                    eddy_mapping = {'none': 0, 'anticyclonic': 1, 'cyclonic': 2}
-                    feature_vector.append(float(eddy_mapping.get(value.lower(), 0)))
-                else:
-                    # 數值特徵
-                    try:
-                        numeric_value = float(value) if value != '' else 0.0
-                        # 處理異常值
-                        if abs(numeric_value) > 1e6:  # 處理極端值
-                            numeric_value = 0.0
-                        feature_vector.append(numeric_value)
-                    except (ValueError, TypeError):
-                        feature_vector.append(0.0)
-            
-            # 特徵工程 - 創建新特徵
-            if len(feature_vector) >= 4:  # 確保有足夠的基本特徵
-                # 溫度與葉綠素的交互作用
-                sst_chl_interaction = feature_vector[2] * feature_vector[4] if len(feature_vector) > 4 else 0.0
-                feature_vector.append(sst_chl_interaction)
-                
-                # 距離特徵（從原點的距離）
-                if len(feature_vector) >= 2:
-                    distance_from_origin = (feature_vector[0]**2 + feature_vector[1]**2)**0.5
-                    feature_vector.append(distance_from_origin)
+        # 4. 特徵工程 - 創建新特徵（依可用特徵的位置計算）
+        final_feature_names = available_features.copy()
+        if data_array.shape[1] >= 4:  # 確保有足夠的基本特徵
+            # 溫度與葉綠素的交互作用
+            if data_array.shape[1] > 4:
+                sst_chl_interaction = data_array[:, 2] * data_array[:, 4]
+            else:
+                sst_chl_interaction = np.zeros(len(data_array))
             
-            processed_data.append(feature_vector)
+            # 距離特徵（從原點的距離）
+            distance_from_origin = (data_array[:, 0]**2 + data_array[:, 1]**2)**0.5
             
-            # 提取標籤（如果存在）
-            if 'has_shark' in row:
-                labels.append(int(float(row['has_shark'])))
-        
-        # 4. 特徵名稱
-        final_feature_names = available_features.copy()
-        if len(processed_data) > 0 and len(processed_data[0]) > len(available_features):
+            data_array = np.column_stack([data_array, sst_chl_interaction, distance_from_origin])
             final_feature_names.extend(['SST_CHL_Interaction', 'Distance_From_Origin'])
         
+        # 提取標籤（如果存在）
+        labels = []
+        if 'has_shark' in df.columns:
+            labels = df['has_shark'].astype(float).astype(int).tolist()
+        
         # 5. 數據標準化（簡單版本）
-        if processed_data:
-            import numpy as np
-            data_array = np.array(processed_data)
-            
-            # 基本統計信息
-            means = np.mean(data_array, axis=0)
-            stds = np.std(data_array, axis=0)
-            
-            # 避免除以零
-            stds = np.where(stds == 0, 1, stds)
-            
-            # 標準化
-            normalized_data = (data_array - means) / stds
-            
-            return normalized_data.tolist(), final_feature_names, labels, None
+        means = np.mean(data_array, axis=0)
+        stds = np.std(data_array, axis=0)
+        
+        # 避免除以零
+        stds = np.where(stds == 0, 1, stds)
+        
+        # 標準化
+        normalized_data = (data_array - means) / stds
         
-        return processed_data, final_feature_names, labels, None
+        return normalized_data, final_feature_names, labels, None
         
     except Exception as e:
         return None, None, None, f"數據工程失敗: {e}"
 
 @router.post("/predict-advanced")
-async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
+async def predict_with_advanced_preprocessing(request: Request, file: UploadFile = File(...)):
     """
     上傳 CSV 檔案，進行完整數據工程後預測
     
@@ -158,6 +315,9 @@ async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
     - 特徵工程
     - 數據標準化
     - 模型預測
+    
+    請求標頭 `Accept: application/octet-stream` 時，改為回傳 float32 二進位的預測機率矩陣
+    （形狀見 X-Shape 標頭，類別順序見 X-Classes 標頭）
     """
     try:
         # 驗證檔案
@@ -170,7 +330,7 @@ async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
             raise HTTPException(status_code=500, detail=error)
         
         # 讀取檔案
-        contents = await file.read()
+        contents = await read_upload(file)
         csv_content = contents.decode('utf-8')
         
         # 數據工程流程
@@ -179,31 +339,26 @@ async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail=process_error)
         
         # 調整特徵數量以匹配模型
+        import numpy as np
         model_features = getattr(model, 'n_features_in_', 13)
         
-        if len(processed_data[0]) > model_features:
+        if processed_data.shape[1] > model_features:
             # 取前 N 個特徵
-            processed_data = [row[:model_features] for row in processed_data]
+            processed_data = processed_data[:, :model_features]
             feature_names = feature_names[:model_features]
-        elif len(processed_data[0]) < model_features:
+        elif processed_data.shape[1] < model_features:
             # 補零
-            for i in range(len(processed_data)):
-                while len(processed_data[i]) < model_features:
-                    processed_data[i].append(0.0)
+            padding = np.zeros((len(processed_data), model_features - processed_data.shape[1]))
+            processed_data = np.hstack([processed_data, padding])
             while len(feature_names) < model_features:
                 feature_names.append(f'feature_{len(feature_names)}')
         
         # 預測
-        import numpy as np
-        X = np.array(processed_data)
-        predictions = model.predict(X)
+        X = to_model_input(processed_data)
+        predictions, probabilities = await prediction_batcher.predict(model, X)
         
-        # 如果模型支援，獲取預測機率
-        probabilities = None
-        try:
-            probabilities = model.predict_proba(X)
-        except:
-            pass
+        if BINARY_MEDIA_TYPE in request.headers.get('accept', ''):
+            return binary_prediction_response(model, predictions, probabilities)
         
         # 準備結果
         result = {
@@ -222,14 +377,14 @@ async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
                 "model_classes": getattr(model, 'classes_', [0, 1]).tolist()
             },
             "predictions": {
-                "values": predictions.tolist(),
+                "values": predictions,
                 "count": len(predictions)
             }
         }
         
         # 添加預測機率
         if probabilities is not None:
-            result["predictions"]["probabilities"] = probabilities.tolist()
+            result["predictions"]["probabilities"] = probabilities
             
             # 預測信心度
             max_probs = np.max(probabilities, axis=1)
@@ -248,21 +403,23 @@ async def predict_with_advanced_preprocessing(file: UploadFile = File(...)):
             }
         
         # 預測統計
-        unique_preds, counts = np.unique(predictions, return_counts=True)
+        unique_preds, counts = count_predictions(predictions)
         result["predictions"]["distribution"] = dict(zip(unique_preds.tolist(), counts.tolist()))
         
-        return result
+        return numpy_json_response(result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"預測失敗: {str(e)}")
 
 @router.post("/predict")
-async def predict_with_csv(file: UploadFile = File(...)):
+async def predict_with_csv(request: Request, file: UploadFile = File(...)):
     """
     簡單版本的預測（向後相容）
     """
     # 重定向到高級預測
-    return await predict_with_advanced_preprocessing(file)
+    return await predict_with_advanced_preprocessing(request, file)
 
 @router.get("/model-info")
 async def get_model_info():
@@ -4,12 +4,14 @@
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
 from typing import Dict, List, Any, Optional
-import io
 import os
 import numpy as np
 
+from app.core.predictions import count_predictions, load_joblib_model, predict_with_probabilities, to_model_input
+from app.core.responses import numpy_json_response
+from app.core.uploads import read_upload
+
 router = APIRouter()
 
 # 模型檔案路徑
@@ -24,12 +26,10 @@ def load_ml_model():
     
     if _model is None:
         try:
-            import joblib
-            
             if not os.path.exists(MODEL_PATH):
                 return None, f"模型檔案不存在: {MODEL_PATH}"
             
-            _model = joblib.load(MODEL_PATH)
+            _model = load_joblib_model(MODEL_PATH)
             return _model, "模型載入成功"
             
         except ImportError:
@@ -66,7 +66,7 @@ async def predict_with_csv_advanced(
             raise HTTPException(status_code=500, detail=message)
         
         # 讀取 CSV 檔案
-        contents = await file.read()
+        contents = await read_upload(file)
         csv_content = contents.decode('utf-8')
         
         print(f"📁 收到 CSV 檔案: {file.filename}")
@@ -115,15 +115,16 @@ async def predict_with_csv_advanced(
                     for i in range(len(feature_names), required_features):
                         feature_names.append(f"feature_{i}")
         
+        features = to_model_input(features)
         print(f"🔢 最終特徵形狀: {features.shape}")
         
         # 進行預測
         try:
-            predictions = model.predict(features)
+            predictions, probabilities = predict_with_probabilities(model, features)
             
-            # 計算統計信息
-            prediction_list = predictions.tolist()
-            unique_predictions = list(set(prediction_list))
+            # 計算統計信息（一次同時取得唯一值與各值的數量）
+            unique_values, unique_counts = count_predictions(predictions)
+            unique_predictions = unique_values.tolist()
             
             result = {
                 "status": "success",
@@ -140,8 +141,8 @@ async def predict_with_csv_advanced(
                     "required_features": required_features
                 },
                 "predictions": {
-                    "values": prediction_list,
-                    "count": len(prediction_list),
+                    "values": predictions,
+                    "count": len(predictions),
                     "unique_values": unique_predictions,
                     "unique_count": len(unique_predictions)
                 }
@@ -149,20 +150,17 @@ async def predict_with_csv_advanced(
             
             # 如果是二分類問題，添加詳細統計
             if len(unique_predictions) <= 2:
-                distribution = {}
-                for pred in prediction_list:
-                    distribution[pred] = distribution.get(pred, 0) + 1
+                distribution = dict(zip(unique_predictions, unique_counts.tolist()))
                 
                 result["predictions"]["distribution"] = distribution
                 
                 # 添加百分比
-                total = len(prediction_list)
+                total = len(predictions)
                 percentages = {k: round(v/total*100, 2) for k, v in distribution.items()}
                 result["predictions"]["percentages"] = percentages
             
-            # 嘗試獲取預測機率
-            try:
-                probabilities = model.predict_proba(features)
+            # 預測機率
+            if probabilities is not None:
                 result["predictions"]["probabilities_summary"] = {
                     "shape": probabilities.shape,
                     "mean_confidence": float(np.mean(np.max(probabilities, axis=1))),
@@ -172,19 +170,18 @@ async def predict_with_csv_advanced(
                 
                 # 只回傳前10個樣本的機率（避免數據太大）
                 if len(probabilities) <= 10:
-                    result["predictions"]["probabilities"] = probabilities.tolist()
+                    result["predictions"]["probabilities"] = probabilities
                 else:
-                    result["predictions"]["probabilities_sample"] = probabilities[:10].tolist()
+                    result["predictions"]["probabilities_sample"] = probabilities[:10]
                     result["predictions"]["note"] = "只顯示前10個樣本的預測機率"
-                
-            except Exception as e:
-                print(f"⚠️ 無法獲取預測機率: {e}")
             
-            return result
+            return numpy_json_response(result)
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"預測失敗: {e}")
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"處理失敗: {str(e)}")
 
@@ -194,6 +191,18 @@ def simple_process_csv(csv_content: str) -> tuple:
         import csv
         import io
         
+        # 快速路徑：標題列之後全部都是數值時，交給 numpy 的 C 解析器一次轉換
+        header_line, _, body = csv_content.partition('\n')
+        header = next(csv.reader([header_line]), None)
+        if header and len(set(header)) == len(header) and body.strip():
+            try:
+                features = np.loadtxt(io.StringIO(body), delimiter=',', comments=None, ndmin=2)
+                if features.shape[1] == len(header):
+                    return features, header, None
+            except ValueError:
+                # 有空值或非數值欄位：改用下方逐格轉換（無法轉換的值補 0）
+                pass
+        
         csv_reader = csv.DictReader(io.StringIO(csv_content))
         data_rows = []
         columns = None
@@ -278,8 +287,7 @@ async def get_processing_info():
                 "3. 篩選特徵",
                 "4. 添加時間特徵 (Day_of_Year, Month)",
                 "5. 填補缺失值 (中位數策略)",
-                "6. 數據增強 (可選) - 生成負樣本",
-                "7. 最終數據清理"
+                "6. 數據增強 (可選) - 生成負樣本"
             ],
             "augmentation_available": True,
             "description": "完整的數據工程流程，包含特徵工程、缺失值處理和數據增強"
@@ -5,9 +5,13 @@
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from typing import Dict, List, Any
-import csv
-import io
 import os
+import queue
+from contextlib import closing
+
+from app.core.predictions import count_predictions, load_joblib_model, predict_with_probabilities, to_model_input
+from app.core.responses import numpy_json_response
+from app.core.uploads import ensure_upload_size
 
 router = APIRouter()
 
@@ -17,6 +21,13 @@ MODEL_PATH = "shark_rf_model_round_18.joblib"
 # 全域模型變數
 _model = None
 
+# 預測時每次讀取與處理的 CSV 列數（限制大型上傳檔案的記憶體用量）
+PREDICT_CHUNK_ROWS = 65_536
+
+# 特徵暫存陣列池：重複使用區塊大小的 float32 陣列，避免每個區塊重新配置記憶體
+FEATURE_BUFFER_POOL_SIZE = 4
+_feature_buffers = queue.Queue(maxsize=FEATURE_BUFFER_POOL_SIZE)
+
 def load_model():
     """載入 joblib 模型"""
     global _model
@@ -27,11 +38,7 @@ def load_model():
             if not os.path.exists(MODEL_PATH):
                 raise FileNotFoundError(f"模型檔案不存在: {MODEL_PATH}")
             
-            # 載入必要套件
-            import joblib
-            import numpy as np
-            
-            _model = joblib.load(MODEL_PATH)
+            _model = load_joblib_model(MODEL_PATH)
             print(f"✅ 模型載入成功: {type(_model).__name__}")
             
             return _model, None
@@ -45,59 +52,102 @@ def load_model():
     
     return _model, None
 
-def process_csv_for_ml(csv_content: str, expected_features: int = 13):
-    """處理 CSV 內容並準備 ML 特徵"""
+def acquire_feature_buffer(rows: int, n_features: int):
+    """從暫存池取得 (rows, n_features) 的 float32 陣列；池中沒有合適的陣列時重新配置"""
+    import numpy as np
+    
     try:
-        # 解析 CSV
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        headers = csv_reader.fieldnames
-        
-        if not headers:
-            return None, None, "CSV 檔案沒有標題行"
-        
-        # 識別數值欄位（排除已知的非數值欄位）
-        non_numeric_fields = {
-            'date', 'individual_id', 'is_in_eddy', 'eddy_type', 
-            'Date', 'Individual_ID', 'is_in_eddy', 'eddy_type'
-        }
-        
-        numeric_headers = [h for h in headers if h not in non_numeric_fields]
-        
-        data_rows = []
-        for row in csv_reader:
-            numeric_row = []
-            for header in numeric_headers:
-                try:
-                    value = float(row.get(header, 0))
-                    numeric_row.append(value)
-                except (ValueError, TypeError):
-                    numeric_row.append(0.0)
-            
-            if len(numeric_row) > 0:
-                data_rows.append(numeric_row)
-        
-        if not data_rows:
-            return None, None, "CSV 檔案沒有有效的數據行"
-        
-        # 調整特徵數量以匹配模型期望
-        if len(numeric_headers) > expected_features:
-            # 如果特徵太多，取前 N 個
-            data_rows = [row[:expected_features] for row in data_rows]
-            numeric_headers = numeric_headers[:expected_features]
-        elif len(numeric_headers) < expected_features:
-            # 如果特徵太少，用0填充
-            for i in range(len(data_rows)):
-                while len(data_rows[i]) < expected_features:
-                    data_rows[i].append(0.0)
-            
-            # 添加虛擬標題
-            while len(numeric_headers) < expected_features:
-                numeric_headers.append(f"feature_{len(numeric_headers) + 1}")
-        
-        return data_rows, numeric_headers, None
-        
+        buffer = _feature_buffers.get_nowait()
+        if buffer.shape == (rows, n_features):
+            return buffer
+    except queue.Empty:
+        pass
+    
+    return np.empty((rows, n_features), dtype=np.float32)
+
+def release_feature_buffer(buffer) -> None:
+    """將暫存陣列歸還暫存池（池已滿時直接丟棄）"""
+    try:
+        _feature_buffers.put_nowait(buffer)
+    except queue.Full:
+        pass
+
+def prepare_ml_features(df, expected_features: int = 13, out=None):
+    """
+    將 CSV 數據框轉為 ML 特徵（回傳連續的 float32 特徵陣列）
+    
+    提供 out 暫存陣列且列數足夠時，特徵直接寫入 out 的前 len(df) 列並回傳該切片
+    """
+    import numpy as np
+    import pandas as pd
+    
+    # 識別數值欄位（排除已知的非數值欄位）
+    non_numeric_fields = {
+        'date', 'individual_id', 'is_in_eddy', 'eddy_type', 
+        'Date', 'Individual_ID', 'is_in_eddy', 'eddy_type'
+    }
+    
+    numeric_headers = [h for h in df.columns if h not in non_numeric_fields]
+    
+    if df.empty or not numeric_headers:
+        return None, None, "CSV 檔案沒有有效的數據行"
+    
+    # 調整特徵數量以匹配模型期望：太多時取前 N 個，太少時其餘欄位用0填充
+    numeric_headers = numeric_headers[:expected_features]
+    n_columns = len(numeric_headers)
+    
+    # 無法轉換的值（空白、文字）以 0 代替
+    values = df[numeric_headers].apply(pd.to_numeric, errors='coerce').fillna(0.0).to_numpy(dtype=np.float32)
+    
+    if out is not None and len(df) <= len(out) and out.shape[1] == expected_features:
+        X = out[:len(df)]
+    else:
+        X = np.empty((len(df), expected_features), dtype=np.float32)
+    
+    X[:, :n_columns] = values
+    X[:, n_columns:] = 0.0
+    
+    # 添加虛擬標題
+    while len(numeric_headers) < expected_features:
+        numeric_headers.append(f"feature_{len(numeric_headers) + 1}")
+    
+    return X, numeric_headers, None
+
+def iter_csv_features(csv_file, expected_features: int = 13, chunk_rows: int = PREDICT_CHUNK_ROWS):
+    """
+    逐塊讀取 CSV 檔案並準備 ML 特徵，每次產生 (特徵陣列, 特徵名稱)
+    
+    整個檔案不會一次解碼或轉成陣列；產生的特徵陣列是共用暫存陣列的切片，
+    只在下一次迭代前有效。CSV 無法處理時拋出 ValueError
+    """
+    import pandas as pd
+    
+    try:
+        reader = pd.read_csv(csv_file, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        raise ValueError("CSV 檔案沒有標題行")
     except Exception as e:
-        return None, None, f"CSV 處理失敗: {e}"
+        raise ValueError(f"CSV 處理失敗: {e}")
+    
+    buffer = acquire_feature_buffer(chunk_rows, expected_features)
+    
+    try:
+        with reader:
+            while True:
+                try:
+                    df = next(reader)
+                except StopIteration:
+                    return
+                except Exception as e:
+                    raise ValueError(f"CSV 處理失敗: {e}")
+                
+                X, headers, process_error = prepare_ml_features(df, expected_features, out=buffer)
+                if process_error:
+                    raise ValueError(process_error)
+                
+                yield X, headers
+    finally:
+        release_feature_buffer(buffer)
 
 @router.post("/predict")
 async def predict_with_csv(file: UploadFile = File(...)):
@@ -121,71 +171,83 @@ async def predict_with_csv(file: UploadFile = File(...)):
         if error:
             raise HTTPException(status_code=500, detail=error)
         
-        # 讀取檔案內容
-        contents = await file.read()
-        csv_content = contents.decode('utf-8')
-        
-        # 獲取模型期望的特徵數量
-        expected_features = getattr(model, 'n_features_in_', 13)
-        
-        # 處理 CSV 數據
-        data_rows, headers, process_error = process_csv_for_ml(csv_content, expected_features)
-        if process_error:
-            raise HTTPException(status_code=400, detail=process_error)
-        
-        # 進行預測
         try:
             import numpy as np
-            
-            X = np.array(data_rows)
-            predictions = model.predict(X)
-            
-            # 準備返回結果
-            result = {
-                "status": "success",
-                "file_info": {
-                    "filename": file.filename,
-                    "rows_processed": len(data_rows),
-                    "features_used": len(headers),
-                    "feature_names": headers
-                },
-                "model_info": {
-                    "model_type": str(type(model).__name__),
-                    "expected_features": expected_features,
-                    "model_path": MODEL_PATH
-                },
-                "predictions": {
-                    "values": predictions.tolist(),
-                    "count": len(predictions)
-                }
-            }
-            
-            # 添加預測統計
-            unique_vals, counts = np.unique(predictions, return_counts=True)
-            result["predictions"]["distribution"] = dict(zip(unique_vals.tolist(), counts.tolist()))
-            
-            # 嘗試獲取預測機率
-            try:
-                probabilities = model.predict_proba(X)
-                # 只返回前10個樣本的機率以避免響應過大
-                sample_probs = probabilities[:min(10, len(probabilities))]
-                result["predictions"]["sample_probabilities"] = sample_probs.tolist()
-                result["predictions"]["probability_shape"] = probabilities.shape
-            except:
-                result["predictions"]["probabilities_available"] = False
-            
-            return result
-            
         except ImportError:
             raise HTTPException(
                 status_code=500, 
                 detail="缺少 numpy 套件，請安裝: pip install numpy"
             )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"預測失敗: {e}"
-            )
+        
+        # 獲取模型期望的特徵數量
+        expected_features = getattr(model, 'n_features_in_', 13)
+        
+        # 檔案大小超過上限時直接拒絕（413）
+        ensure_upload_size(file)
+        
+        # 逐塊讀取上傳的檔案並預測，記憶體用量只取決於區塊大小
+        headers = None
+        prediction_chunks = []
+        sample_probs = []  # 只保留前10個樣本的機率以避免響應過大
+        probability_columns = None
+        
+        try:
+            # 預測失敗離開迴圈時立即關閉產生器，暫存陣列隨即歸還暫存池
+            with closing(iter_csv_features(file.file, expected_features)) as feature_chunks:
+                for X, headers in feature_chunks:
+                    try:
+                        predictions, probabilities = predict_with_probabilities(model, X)
+                    except Exception as e:
+                        raise HTTPException(
+                            status_code=500,
+                            detail=f"預測失敗: {e}"
+                        )
+                    
+                    prediction_chunks.append(predictions)
+                    if probabilities is not None:
+                        probability_columns = probabilities.shape[1]
+                        if len(sample_probs) < 10:
+                            sample_probs.extend(probabilities[:10 - len(sample_probs)].tolist())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if not prediction_chunks:
+            raise HTTPException(status_code=400, detail="CSV 檔案沒有有效的數據行")
+        
+        predictions = np.concatenate(prediction_chunks)
+        
+        # 準備返回結果
+        result = {
+            "status": "success",
+            "file_info": {
+                "filename": file.filename,
+                "rows_processed": len(predictions),
+                "features_used": len(headers),
+                "feature_names": headers
+            },
+            "model_info": {
+                "model_type": str(type(model).__name__),
+                "expected_features": expected_features,
+                "model_path": MODEL_PATH
+            },
+            "predictions": {
+                "values": predictions,
+                "count": len(predictions)
+            }
+        }
+        
+        # 添加預測統計
+        unique_vals, counts = count_predictions(predictions)
+        result["predictions"]["distribution"] = dict(zip(unique_vals.tolist(), counts.tolist()))
+        
+        # 預測機率
+        if probability_columns is not None:
+            result["predictions"]["sample_probabilities"] = sample_probs
+            result["predictions"]["probability_shape"] = (len(predictions), probability_columns)
+        else:
+            result["predictions"]["probabilities_available"] = False
+        
+        return numpy_json_response(result)
         
     except HTTPException:
         raise
@@ -265,24 +327,23 @@ async def predict_batch_data(data: Dict[str, Any]):
         try:
             import numpy as np
             
-            X = np.array(features)
-            predictions = model.predict(X)
+            X = to_model_input(features)
+            predictions, probabilities = predict_with_probabilities(model, X)
             
             result = {
                 "status": "success",
-                "predictions": predictions.tolist(),
+                "predictions": predictions,
                 "count": len(predictions),
                 "input_shape": X.shape
             }
             
             # 添加預測機率
-            try:
-                probabilities = model.predict_proba(X)
-                result["probabilities"] = probabilities.tolist()
-            except:
+            if probabilities is not None:
+                result["probabilities"] = probabilities
+            else:
                 result["probabilities_available"] = False
             
-            return result
+            return numpy_json_response(result)
             
         except ImportError:
             raise HTTPException(
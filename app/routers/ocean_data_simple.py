@@ -5,130 +5,184 @@
 
 from fastapi import APIRouter, HTTPException
 import csv
+import functools
+import mmap
+import os
+import re
+from array import array
 from datetime import datetime, date
-from typing import Dict, Optional
+from statistics import fmean
+from typing import Dict, List, Optional
 
 router = APIRouter()
 
-def parse_date(date_str: str) -> date:
-    """解析日期字符串"""
-    try:
-        return datetime.strptime(date_str, '%Y-%m-%d').date()
-    except:
-        return None
+# 海洋數據 CSV 檔案路徑
+OCEAN_DATA_CSV = "merged_shark_ocean_data.csv"
+
+# 需要計算平均值的欄位：回應欄位名稱 -> CSV 欄位名稱
+AVERAGE_COLUMNS = {
+    "sst_value": "SST_Value",
+    "chl_value": "CHL_Concentration",  # 新檔案用 CHL_Concentration
+    "ssha_value": "SSHA_Value",
+    "longitude": "Longitude",
+    "latitude": "Latitude",
+}
+
+# 可用日期列表的 CSV 檔案路徑
+AVAILABLE_DATES_CSV = "comprehensive_shark_ocean_features - comprehensive_shark_ocean_features.csv"
+
+# 比對每行開頭的日期欄位（標題列不符合格式，自然被略過）
+LEADING_DATE_PATTERN = re.compile(rb'^(\d{4}-\d{2}-\d{2}),', re.M)
 
 def safe_float(value: str) -> Optional[float]:
-    """安全轉換為浮點數"""
+    """安全轉換為浮點數（空值直接回傳 None，只有實際轉換失敗才進入例外處理）"""
+    if value is None or value == '':
+        return None
     try:
-        if value == '' or value is None:
-            return None
         return float(value)
-    except:
+    except (TypeError, ValueError):
         return None
 
-def get_ocean_data_by_date(target_date: date) -> Dict:
-    """根據日期獲取海洋數據"""
-    csv_file = "merged_shark_ocean_data.csv"
+def compute_averages(columns: Dict[str, array]) -> Dict[str, Optional[float]]:
+    """計算各欄位平均值（欄位中只包含有效數值）"""
+    return {
+        name: round(fmean(values), 6) if values else None
+        for name, values in columns.items()
+    }
+
+def process_record(row: Dict[str, str]) -> Dict:
+    """將 CSV 的一行轉為查詢結果中的記錄格式"""
+    return {
+        "longitude": safe_float(row['Longitude']),
+        "latitude": safe_float(row['Latitude']),
+        "sst_value": safe_float(row['SST_Value']),
+        "chl_value": safe_float(row['CHL_Concentration']),
+        "ssha_value": safe_float(row['SSHA_Value']),
+        "has_shark": bool(int(row['has_shark'])),
+        "individual_id": row.get('Individual_ID', ''),
+        "sst_gradient": safe_float(row.get('SST_Gradient', 0)),
+        "chl_gradient": safe_float(row.get('CHL_Gradient', 0)),
+        "ssha_gradient": safe_float(row.get('SSHA_Gradient', 0)),
+        "thermal_front_strength": safe_float(row.get('Thermal_Front_Strength', 0)),
+        "productivity_index": safe_float(row.get('Productivity_Index', 0)),
+        "is_in_eddy": row.get('is_in_eddy', 'False').lower() == 'true',
+        "eddy_type": row.get('eddy_type', 'none'),
+        "daily_movement_km": safe_float(row.get('Daily_Movement_km', 0))
+    }
+
+@functools.lru_cache(maxsize=1)
+def read_records_by_date(mtime: float) -> Dict[str, Dict]:
+    """
+    讀取 CSV 並依日期字串 (YYYY-MM-DD) 建立每日的記錄與摘要統計
     
-    matching_records = []
+    以檔案修改時間為快取鍵：檔案未變更時重複使用，更新後才重新讀檔。
+    每行只在讀檔時轉換一次，索引只保存轉換後的記錄（不另外保留原始的行）。
+    回傳 日期 -> {"records": 該日期的所有記錄, "summary": 摘要統計}
     
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                row_date = parse_date(row['Date'])
-                if row_date == target_date:
-                    matching_records.append(row)
-        
-        if not matching_records:
-            return {
-                "date": str(target_date),
-                "data_count": 0,
-                "records": [],
-                "summary": {
-                    "shark_count": 0,
-                    "no_shark_count": 0,
-                    "total_records": 0,
-                    "shark_presence_rate": 0.0,
-                    "averages": {
-                        "sst_value": None,
-                        "chl_value": None,
-                        "ssha_value": None,
-                        "longitude": None,
-                        "latitude": None
-                    }
-                },
-                "message": "該日期無數據"
-            }
-        
-        # 計算平均值
-        sst_values = [safe_float(record['SST_Value']) for record in matching_records]
-        chl_values = [safe_float(record['CHL_Concentration']) for record in matching_records]  # 新檔案用 CHL_Concentration
-        ssha_values = [safe_float(record['SSHA_Value']) for record in matching_records]
-        longitude_values = [safe_float(record['Longitude']) for record in matching_records]
-        latitude_values = [safe_float(record['Latitude']) for record in matching_records]
-        has_shark_values = [int(record['has_shark']) for record in matching_records]  # 新增：鯊魚標籤
-        
-        # 過濾 None 值
-        sst_values = [v for v in sst_values if v is not None]
-        chl_values = [v for v in chl_values if v is not None]
-        ssha_values = [v for v in ssha_values if v is not None]
-        longitude_values = [v for v in longitude_values if v is not None]
-        latitude_values = [v for v in latitude_values if v is not None]
+    回傳的物件由所有請求共用，不可直接修改或放進回應；請透過 build_ocean_data_response 取得複本
+    """
+    records_by_date = {}
+    columns_by_date = {}  # 日期 -> 欄位 -> 連續的浮點數陣列（忽略缺失值）
+    
+    with open(OCEAN_DATA_CSV, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
         
-        avg_sst = sum(sst_values) / len(sst_values) if sst_values else None
-        avg_chl = sum(chl_values) / len(chl_values) if chl_values else None
-        avg_ssha = sum(ssha_values) / len(ssha_values) if ssha_values else None
-        avg_longitude = sum(longitude_values) / len(longitude_values) if longitude_values else None
-        avg_latitude = sum(latitude_values) / len(latitude_values) if latitude_values else None
+        for row in reader:
+            # CSV 日期已是 ISO 格式 (YYYY-MM-DD)：直接以字串作為鍵，不必逐行 strptime
+            row_date = row['Date']
+            record = process_record(row)
+            records_by_date.setdefault(row_date, []).append(record)
+            
+            columns = columns_by_date.get(row_date)
+            if columns is None:
+                columns = columns_by_date[row_date] = {name: array('d') for name in AVERAGE_COLUMNS}
+            
+            for name, column in columns.items():
+                value = record[name]
+                if value is not None:
+                    column.append(value)
+    
+    data_by_date = {}
+    for row_date, records in records_by_date.items():
+        total_records = len(records)
+        shark_count = sum(record["has_shark"] for record in records)
         
-        # 處理所有記錄，返回完整數據
-        processed_records = []
-        for record in matching_records:
-            processed_record = {
-                "longitude": safe_float(record['Longitude']),
-                "latitude": safe_float(record['Latitude']),
-                "sst_value": safe_float(record['SST_Value']),
-                "chl_value": safe_float(record['CHL_Concentration']),
-                "ssha_value": safe_float(record['SSHA_Value']),
-                "has_shark": bool(int(record['has_shark'])),
-                "individual_id": record.get('Individual_ID', ''),
-                "sst_gradient": safe_float(record.get('SST_Gradient', 0)),
-                "chl_gradient": safe_float(record.get('CHL_Gradient', 0)),
-                "ssha_gradient": safe_float(record.get('SSHA_Gradient', 0)),
-                "thermal_front_strength": safe_float(record.get('Thermal_Front_Strength', 0)),
-                "productivity_index": safe_float(record.get('Productivity_Index', 0)),
-                "is_in_eddy": record.get('is_in_eddy', 'False').lower() == 'true',
-                "eddy_type": record.get('eddy_type', 'none'),
-                "daily_movement_km": safe_float(record.get('Daily_Movement_km', 0))
+        data_by_date[row_date] = {
+            "records": records,
+            "summary": {
+                "shark_count": shark_count,
+                "no_shark_count": total_records - shark_count,
+                "total_records": total_records,
+                "shark_presence_rate": round(shark_count / total_records, 6),
+                "averages": compute_averages(columns_by_date[row_date])
             }
-            processed_records.append(processed_record)
-        
-        # 計算摘要統計
-        shark_records = [r for r in processed_records if r['has_shark']]
-        no_shark_records = [r for r in processed_records if not r['has_shark']]
-        shark_presence_rate = len(shark_records) / len(processed_records)
+        }
+    
+    return data_by_date
+
+def load_records_by_date() -> Dict[str, Dict]:
+    """載入依日期建立的記錄與摘要統計索引（每次只需一次 stat，檔案未變更時直接回傳快取）"""
+    return read_records_by_date(os.path.getmtime(OCEAN_DATA_CSV))
+
+@functools.lru_cache(maxsize=1)
+def read_available_dates(mtime: float) -> List[str]:
+    """讀取排序後的所有可用日期（以檔案修改時間為快取鍵，檔案更新後才重新讀檔）"""
+    # Date 是每行的第一個欄位：直接在 mmap 上比對位元組，不必為每一行建立 dict
+    with open(AVAILABLE_DATES_CSV, 'rb') as file:
+        # 空檔案無法建立 mmap（ValueError），直接視為沒有日期
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
         
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            dates = {match.group(1) for match in LEADING_DATE_PATTERN.finditer(mm)}
+    return sorted(value.decode('ascii') for value in dates)
+
+def load_available_dates() -> List[str]:
+    """載入排序後的所有可用日期（每次只需一次 stat，檔案未變更時直接回傳快取）"""
+    return read_available_dates(os.path.getmtime(AVAILABLE_DATES_CSV))
+
+def build_ocean_data_response(target_date: date) -> Dict:
+    """
+    建立指定日期的查詢結果（記錄與摘要統計都已在讀檔時建立，這裡只組合回應）
+    
+    快取中的記錄與摘要由所有請求共用，回應使用複本，呼叫端修改回應不會影響之後的查詢
+    """
+    day = load_records_by_date().get(target_date.isoformat())
+    
+    if day is None:
         return {
             "date": str(target_date),
-            "data_count": len(processed_records),
-            "records": processed_records,  # 所有記錄
+            "data_count": 0,
+            "records": [],
             "summary": {
-                "shark_count": len(shark_records),
-                "no_shark_count": len(no_shark_records),
-                "total_records": len(processed_records),
-                "shark_presence_rate": round(shark_presence_rate, 6),
+                "shark_count": 0,
+                "no_shark_count": 0,
+                "total_records": 0,
+                "shark_presence_rate": 0.0,
                 "averages": {
-                    "sst_value": round(avg_sst, 6) if avg_sst is not None else None,
-                    "chl_value": round(avg_chl, 6) if avg_chl is not None else None,
-                    "ssha_value": round(avg_ssha, 6) if avg_ssha is not None else None,
-                    "longitude": round(avg_longitude, 6) if avg_longitude is not None else None,
-                    "latitude": round(avg_latitude, 6) if avg_latitude is not None else None
+                    "sst_value": None,
+                    "chl_value": None,
+                    "ssha_value": None,
+                    "longitude": None,
+                    "latitude": None
                 }
             },
-            "message": "查詢成功"
+            "message": "該日期無數據"
         }
+    
+    summary = day["summary"]
+    return {
+        "date": str(target_date),
+        "data_count": summary["total_records"],
+        "records": [dict(record) for record in day["records"]],  # 所有記錄
+        "summary": {**summary, "averages": dict(summary["averages"])},
+        "message": "查詢成功"
+    }
+
+def get_ocean_data_by_date(target_date: date) -> Dict:
+    """根據日期獲取海洋數據"""
+    try:
+        return build_ocean_data_response(target_date)
         
     except FileNotFoundError:
         return {
@@ -172,7 +226,7 @@ def get_ocean_data_by_date(target_date: date) -> Dict:
         }
 
 @router.get("/date/{target_date}")
-async def get_ocean_data_by_date_simple(target_date: str):
+def get_ocean_data_by_date_simple(target_date: str):
     """
     根據日期獲取該日期的所有海洋數據記錄 (簡化版，無需認證)
     
@@ -215,7 +269,7 @@ async def get_ocean_data_by_date_simple(target_date: str):
         raise HTTPException(status_code=500, detail=f"伺服器錯誤: {str(e)}")
 
 @router.post("/date")
-async def get_ocean_data_post_simple(request: dict):
+def get_ocean_data_post_simple(request: dict):
     """
     通過 POST 請求獲取海洋數據 (簡化版，無需認證)
     
@@ -250,22 +304,13 @@ async def get_ocean_data_post_simple(request: dict):
         raise HTTPException(status_code=500, detail=f"伺服器錯誤: {str(e)}")
 
 @router.get("/available-dates")
-async def get_available_dates_simple():
+def get_available_dates_simple():
     """獲取前 20 個可用日期 (簡化版，無需認證)"""
-    csv_file = "comprehensive_shark_ocean_features - comprehensive_shark_ocean_features.csv"
-    dates = set()
-    
     try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                if len(dates) >= 20:
-                    break
-                dates.add(row['Date'])
+        dates = load_available_dates()[:20]
         
         return {
-            "available_dates": sorted(list(dates)),
+            "available_dates": dates,
             "total_count": len(dates),
             "message": "可用日期列表 (前20個)"
         }
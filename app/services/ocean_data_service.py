@@ -3,10 +3,13 @@
 處理 CSV 檔案讀取和數據查詢邏輯
 """
 
+import functools
+import os
+import tempfile
 import pandas as pd
 import numpy as np
-from datetime import date, datetime
-from typing import List, Optional, Dict, Any
+from datetime import date
+from typing import List, Optional, Dict, Any, Tuple
 from pathlib import Path
 
 from app.schemas.ocean_data import (
@@ -16,6 +19,45 @@ from app.schemas.ocean_data import (
     OceanDataListResponse
 )
 
+# Parquet 快取檔的存放目錄
+try:
+    from app.core.config import settings
+    DATA_CACHE_DIR = settings.DATA_CACHE_DIR
+except ImportError:
+    DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nasa-backend-cache"))
+
+# 依日期查詢的快取上限（數據只在 reload_data 時改變）
+QUERY_CACHE_SIZE = 4096
+
+# 每日統計摘要的欄位（依序對應快取中的 tuple）
+SUMMARY_FIELDS = (
+    'record_count',
+    'avg_sst_value', 'avg_chl_value', 'avg_ssha_value',
+    'min_sst_value', 'max_sst_value',
+    'min_chl_value', 'max_chl_value',
+    'min_ssha_value', 'max_ssha_value',
+)
+
+# 需要計算每日統計的數值欄位
+VALUE_COLUMNS = ['SST_Value', 'CHL_Value', 'SSHA_Value']
+
+# 詳細數據的浮點數欄位：模型欄位名稱 -> CSV 欄位名稱
+DETAIL_FLOAT_COLUMNS = {
+    'longitude': 'Longitude',
+    'latitude': 'Latitude',
+    'sst_value': 'SST_Value',
+    'sst_gradient': 'SST_Gradient',
+    'thermal_front_strength': 'Thermal_Front_Strength',
+    'chl_value': 'CHL_Value',
+    'chl_gradient': 'CHL_Gradient',
+    'productivity_index': 'Productivity_Index',
+    'ssha_value': 'SSHA_Value',
+    'ssha_gradient': 'SSHA_Gradient',
+    'dist_to_eddy_center_km': 'dist_to_eddy_center_km',
+    'daily_movement_km': 'Daily_Movement_km',
+    'ocean_complexity_score': 'Ocean_Complexity_Score',
+}
+
 
 class OceanDataService:
     """海洋數據服務類"""
@@ -23,15 +65,30 @@ class OceanDataService:
     def __init__(self):
         self.csv_file_path = "comprehensive_shark_ocean_features - comprehensive_shark_ocean_features.csv"
         self._data_cache = None
+        self._date_index = {}
+        self._daily_agg = pd.DataFrame()
+        self._daily_stats = {}
+        
+        # 依日期查詢的快取：每個實例各自擁有，reload_data 時清除；
+        # 快取只保存不可變的 tuple，每次呼叫另外建立回應物件，呼叫端修改回傳值不會影響快取
+        self._daily_values = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._compute_daily_values)
+        self._summary_values = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._compute_summary_values)
+        self._range_values = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._compute_range_values)
+        
         self._load_data()
     
     def _load_data(self):
         """載入 CSV 數據"""
         try:
             if Path(self.csv_file_path).exists():
-                self._data_cache = pd.read_csv(self.csv_file_path)
+                self._data_cache = self._read_csv()
                 # 轉換日期欄位
                 self._data_cache['Date'] = pd.to_datetime(self._data_cache['Date']).dt.date
+                # 預先轉換布林欄位：每個不同的值只判斷一次
+                is_in_eddy = self._data_cache['is_in_eddy']
+                bool_lookup = {value: self._safe_bool(value) for value in is_in_eddy.dropna().unique()}
+                self._data_cache['is_in_eddy_bool'] = is_in_eddy.map(bool_lookup).astype('boolean')
+                self._build_index()
                 print(f"✅ 成功載入 {len(self._data_cache)} 筆海洋數據")
             else:
                 print(f"⚠️ CSV 檔案不存在: {self.csv_file_path}")
@@ -40,63 +97,105 @@ class OceanDataService:
             print(f"❌ 載入 CSV 檔案失敗: {e}")
             self._data_cache = pd.DataFrame()
     
+    def _read_csv(self) -> pd.DataFrame:
+        """
+        讀取 CSV：Parquet 快取檔存在且不舊於 CSV 時直接使用，否則解析 CSV 並寫出快取（需要 pyarrow）
+        
+        快取檔寫在 DATA_CACHE_DIR，不寫入 CSV 所在的原始碼目錄
+        """
+        csv_path = Path(self.csv_file_path)
+        parquet_path = Path(DATA_CACHE_DIR) / csv_path.with_suffix('.parquet').name
+        
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            try:
+                return pd.read_parquet(parquet_path)
+            except ImportError:
+                print("⚠️ 未安裝 pyarrow，改為讀取 CSV")
+            except Exception as e:
+                print(f"⚠️ 讀取 Parquet 快取失敗，改為讀取 CSV: {e}")
+        
+        data = pd.read_csv(csv_path)
+        
+        # 寫出欄位式快取，下次啟動不需重新解析文字
+        try:
+            parquet_path.parent.mkdir(parents=True, exist_ok=True)
+            data.to_parquet(parquet_path, compression='snappy', index=False)
+            print(f"💾 已建立 Parquet 快取: {parquet_path}")
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Parquet 快取寫入失敗，略過: {e}")
+        
+        return data
+    
+    def _build_index(self):
+        """建立日期索引並預先計算每日統計（平均、最小、最大、筆數）"""
+        grouped = self._data_cache.groupby('Date')
+        self._date_index = grouped.indices
+        
+        daily_agg = grouped[VALUE_COLUMNS].agg(['mean', 'min', 'max'])
+        daily_agg.columns = [f"{col}_{stat}" for col, stat in daily_agg.columns]
+        daily_agg['record_count'] = grouped.size()
+        
+        self._daily_agg = daily_agg
+        self._daily_stats = daily_agg.to_dict('index')
+    
     def get_data_by_date(self, query_date: date) -> Optional[OceanDataResponse]:
         """根據日期獲取海洋數據"""
         if self._data_cache.empty:
             return None
         
-        # 篩選指定日期的數據
-        filtered_data = self._data_cache[self._data_cache['Date'] == query_date]
-        
-        if filtered_data.empty:
-            return OceanDataResponse(
-                date=query_date,
-                sst_value=None,
-                chl_value=None,
-                ssha_value=None,
-                data_count=0
-            )
+        return self._build_daily_response(query_date, self._daily_values(query_date))
+    
+    def _compute_daily_values(self, query_date: date) -> Tuple:
+        """由預先計算的每日統計取得 (SST, CHL, SSHA 平均, 筆數)；沒有數據的日期筆數為 0"""
+        stats = self._daily_stats.get(query_date)
         
-        # 計算平均值（如果有多筆記錄）
-        avg_sst = filtered_data['SST_Value'].mean() if not filtered_data['SST_Value'].isna().all() else None
-        avg_chl = filtered_data['CHL_Value'].mean() if not filtered_data['CHL_Value'].isna().all() else None  
-        avg_ssha = filtered_data['SSHA_Value'].mean() if not filtered_data['SSHA_Value'].isna().all() else None
+        if stats is None:
+            return (None, None, None, 0)
         
-        return OceanDataResponse(
-            date=query_date,
-            sst_value=round(avg_sst, 6) if avg_sst is not None else None,
-            chl_value=round(avg_chl, 6) if avg_chl is not None else None,
-            ssha_value=round(avg_ssha, 6) if avg_ssha is not None else None,
-            data_count=len(filtered_data)
-        )
+        return self._daily_values_from_stats(stats)
     
     def get_detailed_data_by_date(self, query_date: date) -> List[OceanDataDetail]:
         """獲取指定日期的詳細數據"""
         if self._data_cache.empty:
             return []
         
-        filtered_data = self._data_cache[self._data_cache['Date'] == query_date]
+        idx = self._date_index.get(query_date)
+        if idx is None:
+            return []
+        
+        filtered_data = self._data_cache.iloc[idx]
         
+        # 每個欄位一次性轉換，缺失值以整欄遮罩判斷，避免逐格呼叫 pd.isna
+        float_values = {
+            field: self._column_to_list(filtered_data[column])
+            for field, column in DETAIL_FLOAT_COLUMNS.items()
+        }
+        eddy_type_column = filtered_data['eddy_type']
+        eddy_types = [
+            str(v) if ok else None
+            for v, ok in zip(eddy_type_column.tolist(), eddy_type_column.notna().tolist())
+        ]
+        individual_ids = [
+            int(v) if v is not None else None
+            for v in self._column_to_list(filtered_data['Individual_ID'])
+        ]
+        is_in_eddy_column = filtered_data['is_in_eddy_bool']
+        is_in_eddy = [
+            bool(v) if ok else None
+            for v, ok in zip(is_in_eddy_column.tolist(), is_in_eddy_column.notna().tolist())
+        ]
+        
+        # 數據已在伺服器端轉換為正確型別，使用 model_construct 略過逐欄驗證
         result = []
-        for _, row in filtered_data.iterrows():
-            detail = OceanDataDetail(
-                date=row['Date'],
-                longitude=self._safe_float(row['Longitude']),
-                latitude=self._safe_float(row['Latitude']),
-                individual_id=self._safe_int(row['Individual_ID']),
-                sst_value=self._safe_float(row['SST_Value']),
-                sst_gradient=self._safe_float(row['SST_Gradient']),
-                thermal_front_strength=self._safe_float(row['Thermal_Front_Strength']),
-                chl_value=self._safe_float(row['CHL_Value']),
-                chl_gradient=self._safe_float(row['CHL_Gradient']),
-                productivity_index=self._safe_float(row['Productivity_Index']),
-                ssha_value=self._safe_float(row['SSHA_Value']),
-                ssha_gradient=self._safe_float(row['SSHA_Gradient']),
-                is_in_eddy=self._safe_bool(row['is_in_eddy']),
-                eddy_type=str(row['eddy_type']) if pd.notna(row['eddy_type']) else None,
-                dist_to_eddy_center_km=self._safe_float(row['dist_to_eddy_center_km']),
-                daily_movement_km=self._safe_float(row['Daily_Movement_km']),
-                ocean_complexity_score=self._safe_float(row['Ocean_Complexity_Score'])
+        for i in range(len(filtered_data)):
+            detail = OceanDataDetail.model_construct(
+                date=query_date,
+                individual_id=individual_ids[i],
+                is_in_eddy=is_in_eddy[i],
+                eddy_type=eddy_types[i],
+                **{field: values[i] for field, values in float_values.items()}
             )
             result.append(detail)
         
@@ -107,35 +206,29 @@ class OceanDataService:
         if self._data_cache.empty:
             return None
         
-        filtered_data = self._data_cache[self._data_cache['Date'] == query_date]
-        
-        if filtered_data.empty:
-            return OceanDataSummary(
-                date=query_date,
-                record_count=0,
-                avg_sst_value=None,
-                avg_chl_value=None,
-                avg_ssha_value=None,
-                min_sst_value=None,
-                max_sst_value=None,
-                min_chl_value=None,
-                max_chl_value=None,
-                min_ssha_value=None,
-                max_ssha_value=None
-            )
-        
         return OceanDataSummary(
             date=query_date,
-            record_count=len(filtered_data),
-            avg_sst_value=self._safe_float(filtered_data['SST_Value'].mean()),
-            avg_chl_value=self._safe_float(filtered_data['CHL_Value'].mean()),
-            avg_ssha_value=self._safe_float(filtered_data['SSHA_Value'].mean()),
-            min_sst_value=self._safe_float(filtered_data['SST_Value'].min()),
-            max_sst_value=self._safe_float(filtered_data['SST_Value'].max()),
-            min_chl_value=self._safe_float(filtered_data['CHL_Value'].min()),
-            max_chl_value=self._safe_float(filtered_data['CHL_Value'].max()),
-            min_ssha_value=self._safe_float(filtered_data['SSHA_Value'].min()),
-            max_ssha_value=self._safe_float(filtered_data['SSHA_Value'].max())
+            **dict(zip(SUMMARY_FIELDS, self._summary_values(query_date)))
+        )
+    
+    def _compute_summary_values(self, query_date: date) -> Tuple:
+        """取得指定日期的統計摘要數值（依 SUMMARY_FIELDS 的順序）；沒有數據的日期筆數為 0"""
+        stats = self._daily_stats.get(query_date)
+        
+        if stats is None:
+            return (0,) + (None,) * (len(SUMMARY_FIELDS) - 1)
+        
+        return (
+            int(stats['record_count']),
+            self._safe_float(stats['SST_Value_mean']),
+            self._safe_float(stats['CHL_Value_mean']),
+            self._safe_float(stats['SSHA_Value_mean']),
+            self._safe_float(stats['SST_Value_min']),
+            self._safe_float(stats['SST_Value_max']),
+            self._safe_float(stats['CHL_Value_min']),
+            self._safe_float(stats['CHL_Value_max']),
+            self._safe_float(stats['SSHA_Value_min']),
+            self._safe_float(stats['SSHA_Value_max']),
         )
     
     def get_data_by_date_range(self, start_date: date, end_date: date) -> OceanDataListResponse:
@@ -147,47 +240,74 @@ class OceanDataService:
                 data=[]
             )
         
-        # 篩選日期範圍
-        filtered_data = self._data_cache[
-            (self._data_cache['Date'] >= start_date) & 
-            (self._data_cache['Date'] <= end_date)
-        ]
-        
-        # 按日期分組並計算每日平均值
-        daily_data = []
-        unique_dates = sorted(filtered_data['Date'].unique())
-        
-        for date_item in unique_dates:
-            daily_filtered = filtered_data[filtered_data['Date'] == date_item]
-            
-            avg_sst = daily_filtered['SST_Value'].mean() if not daily_filtered['SST_Value'].isna().all() else None
-            avg_chl = daily_filtered['CHL_Value'].mean() if not daily_filtered['CHL_Value'].isna().all() else None
-            avg_ssha = daily_filtered['SSHA_Value'].mean() if not daily_filtered['SSHA_Value'].isna().all() else None
-            
-            daily_data.append(OceanDataResponse(
-                date=date_item,
-                sst_value=round(avg_sst, 6) if avg_sst is not None else None,
-                chl_value=round(avg_chl, 6) if avg_chl is not None else None,
-                ssha_value=round(avg_ssha, 6) if avg_ssha is not None else None,
-                data_count=len(daily_filtered)
-            ))
+        total_records, daily_values = self._range_values(start_date, end_date)
         
         return OceanDataListResponse(
-            total_records=len(filtered_data),
+            total_records=total_records,
             date_range=f"{start_date} 到 {end_date}",
-            data=daily_data
+            data=[self._build_daily_response(date_item, values) for date_item, values in daily_values]
         )
     
+    def _compute_range_values(self, start_date: date, end_date: date) -> Tuple:
+        """取得日期範圍內的 (總筆數, ((日期, 每日數值), ...))"""
+        # 從每日統計中篩選日期範圍（索引已依日期排序）
+        daily_range = self._daily_agg.loc[start_date:end_date]
+        
+        daily_values = tuple(
+            (date_item, self._daily_values_from_stats(stats))
+            for date_item, stats in daily_range.to_dict('index').items()
+        )
+        
+        return int(daily_range['record_count'].sum()), daily_values
+    
     def get_available_dates(self) -> List[date]:
         """獲取所有可用的日期"""
         if self._data_cache.empty:
             return []
         
-        return sorted(self._data_cache['Date'].unique())
+        return self._daily_agg.index.tolist()
     
     def reload_data(self):
         """重新載入數據"""
         self._load_data()
+        self.clear_query_cache()
+    
+    def clear_query_cache(self):
+        """清除此實例依日期查詢的快取結果"""
+        self._daily_values.cache_clear()
+        self._summary_values.cache_clear()
+        self._range_values.cache_clear()
+    
+    def _daily_values_from_stats(self, stats: Dict[str, Any]) -> Tuple:
+        """由每日統計取得 (SST, CHL, SSHA 平均, 筆數)，平均值四捨五入至小數第 6 位"""
+        avg_sst = self._safe_float(stats['SST_Value_mean'])
+        avg_chl = self._safe_float(stats['CHL_Value_mean'])
+        avg_ssha = self._safe_float(stats['SSHA_Value_mean'])
+        
+        return (
+            round(avg_sst, 6) if avg_sst is not None else None,
+            round(avg_chl, 6) if avg_chl is not None else None,
+            round(avg_ssha, 6) if avg_ssha is not None else None,
+            int(stats['record_count']),
+        )
+    
+    def _build_daily_response(self, query_date: date, values: Tuple) -> OceanDataResponse:
+        """由每日數值 (SST, CHL, SSHA 平均, 筆數) 建立新的響應物件"""
+        sst_value, chl_value, ssha_value, data_count = values
+        
+        return OceanDataResponse.model_construct(
+            date=query_date,
+            sst_value=sst_value,
+            chl_value=chl_value,
+            ssha_value=ssha_value,
+            data_count=data_count
+        )
+    
+    def _column_to_list(self, series: pd.Series) -> List[Optional[float]]:
+        """將整欄轉為浮點數列表，缺失或無法轉換的值為 None"""
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        # NaN 是唯一不等於自身的值
+        return [v if v == v else None for v in values.tolist()]
     
     def _safe_float(self, value) -> Optional[float]:
         """安全轉換為浮點數"""
@@ -219,5 +339,7 @@ class OceanDataService:
             return None
 
 
-# 創建全域服務實例
-ocean_data_service = OceanDataService()
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def get_ocean_data_service() -> OceanDataService:
+    """取得全域服務實例（第一次呼叫時才載入 CSV，避免在 import 時進行 I/O）"""
+    return OceanDataService()
\ No newline at end of file
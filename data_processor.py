@@ -6,11 +6,14 @@ ML 數據預處理模組
 import pandas as pd
 import numpy as np
 from math import radians, sin, cos, sqrt, atan2
-from sklearn.impute import SimpleImputer
 from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
 from typing import Tuple, List, Optional
 import os
 
+# 上傳 CSV 分塊讀取的列數
+CSV_CHUNK_SIZE = 50_000
+
 class OceanDataProcessor:
     """海洋數據預處理器"""
     
@@ -23,7 +26,7 @@ class OceanDataProcessor:
             'SSHA_Gradient', 'dist_to_eddy_center_km', 
             'Daily_Movement_km', 'Day_of_Year'
         ]
-        self.imputer = None
+        self.medians = None
         
     def load_data(self) -> pd.DataFrame:
         """載入 CSV 數據"""
@@ -89,16 +92,18 @@ class OceanDataProcessor:
     
     def impute_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         """填補缺失值"""
-        # 使用中位數填補數值特徵的缺失值
-        self.imputer = SimpleImputer(strategy='median')
-        
         # 只對數值特徵進行填補
         numeric_features = [f for f in self.features if f in df.columns and df[f].dtype in ['float64', 'int64']]
         
         if numeric_features:
             print(f"🔧 填補 {len(numeric_features)} 個數值特徵的缺失值")
-            imputed_data = self.imputer.fit_transform(df[numeric_features])
-            df[numeric_features] = imputed_data
+            # 使用中位數填補數值特徵的缺失值（直接以 NumPy 處理）
+            arr = df[numeric_features].to_numpy(dtype=np.float64)
+            medians = np.nanmedian(arr, axis=0)
+            rows, cols = np.where(np.isnan(arr))
+            arr[rows, cols] = np.take(medians, cols)
+            df[numeric_features] = arr
+            self.medians = dict(zip(numeric_features, medians))
         
         return df
     
@@ -130,23 +135,34 @@ class OceanDataProcessor:
         print(f"📍 數據範圍: 經度 {lon_min:.2f} ~ {lon_max:.2f}, 緯度 {lat_min:.2f} ~ {lat_max:.2f}")
         
         # 生成網格點
-        new_points = []
-        total_points = 0
-        valid_points = 0
-        
-        for lon in np.arange(lon_min, lon_max, grid_spacing):
-            for lat in np.arange(lat_min, lat_max, grid_spacing):
-                total_points += 1
-                
-                # 檢查是否距離任何鯊魚點超過10公里
-                min_distance = min([
-                    self.haversine_distance(lat, lon, shark_lat, shark_lon)
-                    for shark_lon, shark_lat in shark_coords
-                ])
-                
-                if min_distance > 10:  # 距離所有鯊魚點都超過10公里
-                    new_points.append([lon, lat, 0])  # has_shark = 0
-                    valid_points += 1
+        grid_lon, grid_lat = np.meshgrid(
+            np.arange(lon_min, lon_max, grid_spacing),
+            np.arange(lat_min, lat_max, grid_spacing),
+            indexing='ij'
+        )
+        grid_lon = grid_lon.ravel()
+        grid_lat = grid_lat.ravel()
+        total_points = len(grid_lon)
+        
+        # 以鯊魚點平均緯度做等距圓柱投影（公里），局部範圍內近似大圓距離
+        R = 6371  # 地球半徑（公里）
+        cos_lat = np.cos(np.radians(shark_coords[:, 1].mean()))
+        shark_xy = np.column_stack([
+            R * cos_lat * np.radians(shark_coords[:, 0]),
+            R * np.radians(shark_coords[:, 1])
+        ])
+        grid_xy = np.column_stack([
+            R * cos_lat * np.radians(grid_lon),
+            R * np.radians(grid_lat)
+        ])
+        
+        # KD-tree 最近鄰查詢：10 公里內沒有鯊魚點時距離為 inf
+        tree = cKDTree(shark_xy)
+        dists, _ = tree.query(grid_xy, k=1, distance_upper_bound=10)
+        keep = np.isinf(dists)  # 距離所有鯊魚點都超過10公里
+        
+        new_points = [[lon, lat, 0] for lon, lat in zip(grid_lon[keep], grid_lat[keep])]  # has_shark = 0
+        valid_points = len(new_points)
         
         print(f"🎯 生成 {valid_points}/{total_points} 個負樣本點")
         
@@ -188,20 +204,6 @@ class OceanDataProcessor:
         print(f"✅ 數據增強完成: {df.shape[0]} → {augmented_df.shape[0]} 行")
         return augmented_df
     
-    def final_imputation(self, df: pd.DataFrame) -> pd.DataFrame:
-        """最終填補處理"""
-        print("🔧 進行最終數據清理...")
-        
-        # 重新填補所有特徵的缺失值
-        numeric_features = [f for f in self.features if f in df.columns and df[f].dtype in ['float64', 'int64']]
-        
-        if numeric_features:
-            final_imputer = SimpleImputer(strategy='median')
-            imputed_data = final_imputer.fit_transform(df[numeric_features])
-            df[numeric_features] = imputed_data
-        
-        return df
-    
     def process_data(self, enable_augmentation: bool = True) -> pd.DataFrame:
         """完整的數據處理流程"""
         print("🚀 開始數據預處理...")
@@ -221,13 +223,10 @@ class OceanDataProcessor:
         # 5. 填補缺失值
         df = self.impute_missing_values(df)
         
-        # 6. 數據增強（可選）
+        # 6. 數據增強（可選，新增點的特徵已由插值或中位數填補）
         if enable_augmentation:
             df = self.augment_data(df)
         
-        # 7. 最終填補
-        df = self.final_imputation(df)
-        
         print("✅ 數據預處理完成!")
         print(f"📊 最終數據形狀: {df.shape}")
         print(f"🦈 鯊魚樣本: {(df['has_shark'] == 1).sum()} 個")
@@ -261,28 +260,39 @@ def process_uploaded_csv(csv_content: str, enable_augmentation: bool = False) ->
     try:
         import io
         
-        # 將字符串轉換為 DataFrame
-        df = pd.read_csv(io.StringIO(csv_content))
-        
         # 創建臨時處理器
         processor = OceanDataProcessor("")
         processor.csv_file_path = None  # 不使用文件路径
         
-        # 手動設置數據
-        if 'Date' not in df.columns:
-            # 如果沒有日期欄位，添加一個假的日期
-            df['Date'] = pd.to_datetime('2024-01-01')
-        
-        if 'has_shark' not in df.columns:
-            # 如果沒有鯊魚標籤，添加一個預設值
-            df['has_shark'] = 0
+        # 分塊讀取 CSV，每塊只保留後續需要的欄位以限制記憶體峰值
+        frames = []
+        keep_columns = None
+        
+        for chunk in pd.read_csv(io.StringIO(csv_content), chunksize=CSV_CHUNK_SIZE):
+            # 手動設置數據
+            if 'Date' not in chunk.columns:
+                # 如果沒有日期欄位，添加一個假的日期
+                chunk['Date'] = '2024-01-01'
+            
+            if 'has_shark' not in chunk.columns:
+                # 如果沒有鯊魚標籤，添加一個預設值
+                chunk['has_shark'] = 0
+            
+            if keep_columns is None:
+                # 篩選特徵（所有區塊的欄位相同，只需判斷一次）
+                chunk = processor.filter_features(chunk)
+                keep_columns = list(dict.fromkeys(
+                    processor.features + ['Date', 'Longitude', 'Latitude', 'has_shark']
+                ))
+            
+            frames.append(chunk[keep_columns])
+        
+        df = pd.concat(frames, ignore_index=True)
+        del frames
         
         # 確保 Date 是 datetime 類型
         df['Date'] = pd.to_datetime(df['Date'])
         
-        # 篩選特徵
-        df = processor.filter_features(df)
-        
         # 添加時間特徵
         df = processor.add_time_features(df)
         
@@ -293,9 +303,6 @@ def process_uploaded_csv(csv_content: str, enable_augmentation: bool = False) ->
         if enable_augmentation:
             df = processor.augment_data(df)
         
-        # 最終填補
-        df = processor.final_imputation(df)
-        
         # 獲取特徵矩陣
         features = processor.get_features_for_prediction(df)
         feature_names = [f for f in processor.features if f in df.columns]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+將 joblib 隨機森林模型轉換為 ONNX 格式
+- 輸入: shark_rf_model_round_18.joblib
+- 輸出: shark_rf_model_round_18.onnx
+
+API 預測時若偵測到此檔（且已安裝 onnxruntime），改用 ONNX Runtime 計算預測機率，
+不必在 Python 中逐棵走訪樹；joblib 模型仍用於讀取特徵數量與類別等資訊
+需要額外安裝: pip install skl2onnx onnxruntime
+"""
+
+import os
+import sys
+
+MODEL_PATH = "shark_rf_model_round_18.joblib"
+ONNX_MODEL_PATH = "shark_rf_model_round_18.onnx"
+
+def export_onnx_model(model_file: str = MODEL_PATH,
+                      onnx_file: str = ONNX_MODEL_PATH) -> bool:
+    """載入 joblib 模型並輸出 ONNX 檔（輸出直接為機率矩陣，不轉成 dict 列表）"""
+    print("🔄 開始轉換模型為 ONNX 格式...")
+
+    if not os.path.exists(model_file):
+        print(f"❌ 找不到模型檔案: {model_file}")
+        return False
+
+    try:
+        import joblib
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+    except ImportError as e:
+        print(f"❌ 缺少必要套件: {e}")
+        return False
+
+    try:
+        model = joblib.load(model_file)
+        print(f"   ✅ 載入模型: {type(model).__name__} ({model.n_features_in_} 個特徵)")
+
+        # 輸入為 float32 矩陣（與 API 傳給模型的型別相同），列數不固定
+        onnx_model = convert_sklearn(
+            model,
+            initial_types=[('input', FloatTensorType([None, model.n_features_in_]))],
+            options={id(model): {'zipmap': False}},
+        )
+
+        with open(onnx_file, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+
+        print(f"💾 已輸出 ONNX 模型到: {onnx_file} "
+              f"({os.path.getsize(onnx_file) / (1024 * 1024):.1f} MB)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 轉換模型時出錯: {e}")
+        return False
+
+if __name__ == "__main__":
+    # 轉換失敗時以非零狀態結束，讓 Docker 建置失敗而不是產出沒有 ONNX 模型的映像
+    sys.exit(0 if export_onnx_model() else 1)
@@ -0,0 +1,35 @@
+"""
+Gunicorn 設定檔（生產環境）
+以多個 UvicornWorker 工作行程執行 FastAPI，讓 CPU 密集的預測請求可以使用所有核心
+
+啟動: gunicorn -c gunicorn_conf.py main:app
+開發環境請改用 python main.py 或 uvicorn --reload
+"""
+
+import multiprocessing
+import os
+
+# 監聽位址
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# 工作行程數：預設每個 CPU 核心一個，可用 WEB_CONCURRENCY 覆寫
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.getenv("WEB_CONCURRENCY", cpu_count))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 每個工作行程預測時使用的執行緒數：由各行程平分 CPU 核心，
+# 避免每個行程都用上所有核心而產生約 核心數² 個互搶 CPU 的執行緒，可用 PREDICT_N_JOBS 覆寫
+os.environ.setdefault("PREDICT_N_JOBS", str(max(1, cpu_count // workers)))
+
+# 主行程先匯入應用程式再 fork：pandas / scikit-learn 等模組只載入一次，由工作行程共用
+preload_app = True
+
+# 大型 CSV 上傳的預測可能需要較長時間
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# 日誌輸出到標準輸出
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -3,12 +3,13 @@
 test for modify
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-import csv
-from datetime import datetime, date
-from typing import Dict, Optional
-import uvicorn
+import functools
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict
 
 # 嘗試載入配置（如果可用）
 try:
@@ -33,6 +34,27 @@ except ImportError:
     def get_cors_origins():
         return ["*"]
 
+# 預設 JSON 回應類別（有 orjson 時使用較快的序列化）
+try:
+    from app.core.responses import DefaultJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
+
+# 應用程式啟動時（開始接受請求前）執行的預先載入工作
+STARTUP_PRELOADS = []
+
+# 應用程式關閉時執行的清理工作（非同步函式）
+SHUTDOWN_HOOKS = []
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用程式生命週期：啟動時先載入模型與數據，第一個請求不必承擔載入成本；關閉時停止背景工作"""
+    for preload in STARTUP_PRELOADS:
+        preload()
+    yield
+    for shutdown in SHUTDOWN_HOOKS:
+        await shutdown()
+
 def create_application() -> FastAPI:
     """創建 FastAPI 應用程式實例"""
     
@@ -40,6 +62,8 @@ def create_application() -> FastAPI:
         title=settings.PROJECT_NAME,
         description=settings.PROJECT_DESCRIPTION,
         version=settings.VERSION,
+        default_response_class=DefaultJSONResponse,
+        lifespan=lifespan,
         openapi_url=f"{settings.API_V1_STR}/openapi.json" if hasattr(settings, 'API_V1_STR') else "/openapi.json"
     )
 
@@ -54,7 +78,7 @@ def create_application() -> FastAPI:
 
     # 嘗試載入路由
     try:
-        from app.routers import api_router
+        from app.routers import api_router, preload as preload_routers, shutdown as shutdown_routers
         
         # 註冊 API 路由
         app.include_router(
@@ -62,6 +86,8 @@ def create_application() -> FastAPI:
             prefix=settings.API_V1_STR if hasattr(settings, 'API_V1_STR') else "/api/v1"
         )
         
+        STARTUP_PRELOADS.append(preload_routers)
+        SHUTDOWN_HOOKS.append(shutdown_routers)
         router_loaded = True
         
     except ImportError as e:
@@ -76,40 +102,75 @@ def create_application() -> FastAPI:
 app, router_loaded = create_application()
 
 
+# 根端點與健康檢查的內容在程序生命週期內不變：啟動時序列化一次，每個請求直接回傳位元組
+ROOT_RESPONSE_BODY = DefaultJSONResponse({
+    "message": f"歡迎使用 {settings.PROJECT_NAME}",
+    "version": settings.VERSION,
+    "status": "running",
+    "router_loaded": router_loaded,
+    "endpoints": {
+        "docs": "/docs",
+        "redoc": "/redoc",
+        "health": "/health"
+    }
+}).body
+
+HEALTH_RESPONSE_BODY = DefaultJSONResponse({
+    "status": "healthy",
+    "service": settings.PROJECT_NAME,
+    "version": settings.VERSION,
+    "router_loaded": router_loaded
+}).body
+
 @app.get("/")
 async def root():
     """根端點"""
-    return {
-        "message": f"歡迎使用 {settings.PROJECT_NAME}",
-        "version": settings.VERSION,
-        "status": "running",
-        "router_loaded": router_loaded,
-        "endpoints": {
-            "docs": "/docs",
-            "redoc": "/redoc",
-            "health": "/health"
-        }
-    }
+    return Response(content=ROOT_RESPONSE_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """健康檢查端點"""
-    return {
-        "status": "healthy",
-        "service": settings.PROJECT_NAME,
-        "version": settings.VERSION,
-        "router_loaded": router_loaded
-    }
+    return Response(content=HEALTH_RESPONSE_BODY, media_type="application/json")
 
 # 全域變數和函數
 OCEAN_DATA_PATH = "merged_shark_ocean_data.csv"
+OCEAN_DATA_PARQUET_PATH = "merged_shark_ocean_data.parquet"
+OCEAN_DATA_COLUMNS = [
+    'Date', 'SST_Value', 'CHL_Concentration', 'SSHA_Value',
+    'Longitude', 'Latitude', 'has_shark'
+]
 
-def safe_float(value):
-    """安全轉換為浮點數"""
-    try:
-        return float(value) if value else None
-    except:
+def read_ocean_data(columns):
+    """讀取海洋數據：Parquet 檔存在且不舊於 CSV 時優先使用（需要 pyarrow），否則讀 CSV"""
+    import pandas as pd
+    
+    if os.path.exists(OCEAN_DATA_PARQUET_PATH) and (
+        not os.path.exists(OCEAN_DATA_PATH)
+        or os.path.getmtime(OCEAN_DATA_PARQUET_PATH) >= os.path.getmtime(OCEAN_DATA_PATH)
+    ):
+        try:
+            return pd.read_parquet(OCEAN_DATA_PARQUET_PATH, columns=columns)
+        except ImportError:
+            print("⚠️ 未安裝 pyarrow，改為讀取 CSV")
+    
+    # 只解析需要的欄位，數值欄位由 pandas 直接轉為浮點數（空白即 NaN）
+    return pd.read_csv(OCEAN_DATA_PATH, usecols=columns)
+
+# 每日平均的欄位：CSV 欄位名稱 -> API 回應欄位名稱
+OCEAN_AVERAGE_COLUMNS = {
+    'SST_Value': 'sst_value',
+    'CHL_Concentration': 'chl_value',  # 注意：新檔案用 CHL_Concentration
+    'SSHA_Value': 'ssha_value',
+    'Longitude': 'longitude',
+    'Latitude': 'latitude',
+    'has_shark': 'shark_presence_rate',  # 當天有多少比例的記錄有鯊魚
+}
+
+def round_or_none(value, digits: int = 6):
+    """四捨五入，缺失值 (None/NaN) 回傳 None"""
+    if value is None or value != value:
         return None
+    return round(float(value), digits)
 
 # 如果路由載入失敗，提供完整的海洋數據和ML預測端點
 if not router_loaded:
@@ -119,69 +180,65 @@ if not router_loaded:
     # 海洋數據 API
     # ============================
     
-    @app.get("/api/v1/ocean-data/query/{target_date}")
-    async def query_ocean_data_by_date(target_date: str):
-        """根據日期查詢海洋數據（包含經度和緯度）"""
+    def get_ocean_data_index() -> Dict[str, Dict]:
+        """取得依日期彙總的海洋數據索引（第一次呼叫時載入數據檔）"""
+        if getattr(app.state, "ocean_by_date", None) is None:
+            import pandas as pd
+            
+            df = read_ocean_data(OCEAN_DATA_COLUMNS)
+            df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d').dt.strftime('%Y-%m-%d')
+            
+            grouped = df.groupby('Date')
+            
+            # 所有數值欄位一次計算平均值（單一分組歸約），再改為 API 回應的欄位名稱
+            by_date = grouped[list(OCEAN_AVERAGE_COLUMNS)].mean().rename(columns=OCEAN_AVERAGE_COLUMNS)
+            by_date['data_count'] = grouped.size()
+            
+            app.state.ocean_by_date = by_date.to_dict('index')
+            app.state.available_dates = sorted(app.state.ocean_by_date)
+        
+        return app.state.ocean_by_date
+    
+    def preload_ocean_data():
+        """啟動時預先載入海洋數據，避免每次請求重新讀取 CSV"""
+        try:
+            by_date = get_ocean_data_index()
+            print(f"✅ 已預先載入 {len(by_date)} 天的海洋數據")
+        except Exception as e:
+            print(f"⚠️ 海洋數據預先載入失敗: {e}")
+    
+    STARTUP_PRELOADS.append(preload_ocean_data)
+    
+    def _lookup(target_date: str) -> Dict:
+        """查詢指定日期的彙總海洋數據（兩個查詢端點共用，錯誤轉為 HTTPException）"""
         try:
             # 解析日期
             query_date = datetime.strptime(target_date, '%Y-%m-%d').date()
             
-            # 查詢 CSV 數據
-            matching_records = []
+            # 查詢預先彙總的數據
+            record = get_ocean_data_index().get(query_date.isoformat())
             
-            with open(OCEAN_DATA_PATH, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                for row in reader:
-                    row_date = datetime.strptime(row['Date'], '%Y-%m-%d').date()
-                    if row_date == query_date:
-                        matching_records.append(row)
-            
-            if not matching_records:
+            if record is None:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"找不到日期 {target_date} 的海洋數據"
                 )
             
-            # 計算平均值
-            sst_values = [safe_float(record['SST_Value']) for record in matching_records]
-            chl_values = [safe_float(record['CHL_Concentration']) for record in matching_records]  # 注意：新檔案用 CHL_Concentration
-            ssha_values = [safe_float(record['SSHA_Value']) for record in matching_records]
-            longitude_values = [safe_float(record['Longitude']) for record in matching_records]
-            latitude_values = [safe_float(record['Latitude']) for record in matching_records]
-            has_shark_values = [int(record['has_shark']) for record in matching_records]  # 新增：鯊魚標籤
-            
-            # 過濾 None 值
-            sst_values = [v for v in sst_values if v is not None]
-            chl_values = [v for v in chl_values if v is not None]
-            ssha_values = [v for v in ssha_values if v is not None]
-            longitude_values = [v for v in longitude_values if v is not None]
-            latitude_values = [v for v in latitude_values if v is not None]
-            
-            avg_sst = sum(sst_values) / len(sst_values) if sst_values else None
-            avg_chl = sum(chl_values) / len(chl_values) if chl_values else None
-            avg_ssha = sum(ssha_values) / len(ssha_values) if ssha_values else None
-            avg_longitude = sum(longitude_values) / len(longitude_values) if longitude_values else None
-            avg_latitude = sum(latitude_values) / len(latitude_values) if latitude_values else None
-            
-            # 計算鯊魚出現率 (當天有多少比例的記錄有鯊魚)
-            shark_presence_rate = sum(has_shark_values) / len(has_shark_values) if has_shark_values else 0
-            has_shark = shark_presence_rate > 0  # 如果當天有任何記錄顯示有鯊魚，就標記為有鯊魚
+            shark_presence_rate = record['shark_presence_rate']
             
             return {
-                "status": "success",
-                "date": target_date,
-                "sst_value": round(avg_sst, 6) if avg_sst is not None else None,
-                "chl_value": round(avg_chl, 6) if avg_chl is not None else None,
-                "ssha_value": round(avg_ssha, 6) if avg_ssha is not None else None,
-                "longitude": round(avg_longitude, 6) if avg_longitude is not None else None,
-                "latitude": round(avg_latitude, 6) if avg_latitude is not None else None,
-                "has_shark": has_shark,
+                "sst_value": round_or_none(record['sst_value']),
+                "chl_value": round_or_none(record['chl_value']),
+                "ssha_value": round_or_none(record['ssha_value']),
+                "longitude": round_or_none(record['longitude']),
+                "latitude": round_or_none(record['latitude']),
+                "has_shark": shark_presence_rate > 0,  # 如果當天有任何記錄顯示有鯊魚，就標記為有鯊魚
                 "shark_presence_rate": round(shark_presence_rate, 3),
-                "data_count": len(matching_records),
-                "message": "查詢成功"
+                "data_count": record['data_count'],
             }
             
+        except HTTPException:
+            raise
         except ValueError:
             raise HTTPException(
                 status_code=400, 
@@ -198,23 +255,28 @@ if not router_loaded:
                 detail=f"查詢失敗: {str(e)}"
             )
     
+    @app.get("/api/v1/ocean-data/query/{target_date}")
+    def query_ocean_data_by_date(target_date: str):
+        """根據日期查詢海洋數據（包含經度和緯度）"""
+        result = _lookup(target_date)
+        
+        return {
+            "status": "success",
+            "date": target_date,
+            **result,
+            "message": "查詢成功"
+        }
+    
     @app.get("/api/v1/ocean-data/available-dates")
-    async def get_available_dates():
+    def get_available_dates():
         """獲取可用的日期列表"""
         try:
-            dates = set()
-            
-            with open(OCEAN_DATA_PATH, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                for row in reader:
-                    if len(dates) >= 20:  # 限制返回數量
-                        break
-                    dates.add(row['Date'])
+            get_ocean_data_index()
+            dates = app.state.available_dates[:20]  # 限制返回數量
             
             return {
                 "status": "success",
-                "available_dates": sorted(list(dates)),
+                "available_dates": dates,
                 "total_count": len(dates),
                 "message": "可用日期列表 (前20個)"
             }
@@ -227,27 +289,22 @@ if not router_loaded:
     
     # 保留舊的簡單端點以保持向後兼容
     @app.get("/simple-ocean-data/{date}")
-    async def get_simple_ocean_data(date: str):
+    def get_simple_ocean_data(date: str):
         """簡單的海洋數據查詢端點（向後兼容）"""
-        try:
-            # 重新導向到新的 API
-            result = await query_ocean_data_by_date(date)
-            
-            # 轉換格式以保持兼容性
-            return {
-                "status": "success",
-                "date": date,
-                "data": {
-                    "sst_value": result.get("sst_value"),
-                    "chl_value": result.get("chl_value"), 
-                    "ssha_value": result.get("ssha_value"),
-                    "longitude": result.get("longitude"),
-                    "latitude": result.get("latitude")
-                }
+        result = _lookup(date)
+        
+        # 轉換格式以保持兼容性
+        return {
+            "status": "success",
+            "date": date,
+            "data": {
+                "sst_value": result["sst_value"],
+                "chl_value": result["chl_value"], 
+                "ssha_value": result["ssha_value"],
+                "longitude": result["longitude"],
+                "latitude": result["latitude"]
             }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"查詢失敗: {str(e)}")
+        }
     
     # ============================
     # 機器學習預測 API
@@ -255,32 +312,39 @@ if not router_loaded:
     
     # ML 相關全域變數
     MODEL_PATH = "shark_rf_model_round_18.joblib"
-    _model = None
+    
+    @functools.lru_cache(maxsize=1)
+    def _load_model_file():
+        """從磁碟反序列化模型（結果快取，整個程序只載入一次；失敗時不快取）"""
+        from app.core.predictions import load_joblib_model
+        
+        return load_joblib_model(MODEL_PATH)
     
     def load_ml_model():
         """載入機器學習模型"""
-        global _model
+        already_loaded = _load_model_file.cache_info().currsize > 0
         
-        if _model is None:
-            try:
-                import joblib
-                import os
-                
-                if not os.path.exists(MODEL_PATH):
-                    return None, f"模型檔案不存在: {MODEL_PATH}"
-                
-                _model = joblib.load(MODEL_PATH)
-                return _model, "模型載入成功"
-                
-            except ImportError:
-                return None, "請安裝 joblib: pip install joblib"
-            except Exception as e:
-                return None, f"載入模型失敗: {e}"
+        if not already_loaded and not os.path.exists(MODEL_PATH):
+            return None, f"模型檔案不存在: {MODEL_PATH}"
         
-        return _model, "模型已載入"
+        try:
+            model = _load_model_file()
+        except ImportError:
+            return None, "請安裝 joblib: pip install joblib"
+        except Exception as e:
+            return None, f"載入模型失敗: {e}"
+        
+        return model, "模型已載入" if already_loaded else "模型載入成功"
+    
+    def preload_ml_model():
+        """啟動時預先載入模型，避免第一個請求承擔反序列化成本"""
+        model, message = load_ml_model()
+        print(f"{'✅' if model else '⚠️'} {message}")
+    
+    STARTUP_PRELOADS.append(preload_ml_model)
     
     @app.get("/api/v1/ml/model-info")
-    async def get_model_info():
+    def get_model_info():
         """獲取模型信息"""
         try:
             import os
@@ -15,6 +15,7 @@ def merge_shark_data():
     shark_file = "v8.1_comprehensive_shark_features.csv"
     random_file = "v8.1_standardized_random_features.csv"
     output_file = "merged_shark_ocean_data.csv"
+    parquet_file = "merged_shark_ocean_data.parquet"
     
     print("🦈 開始處理鯊魚數據合併...")
     
@@ -55,6 +56,19 @@ def merge_shark_data():
         print(f"💾 保存合併數據到: {output_file}")
         merged_df.to_csv(output_file, index=False)
         
+        # 同時輸出 Parquet（欄位式儲存，API 啟動時不需重新解析文字）
+        try:
+            # 兩個來源的 Individual_ID 型別不同（數字 / 字串），文字欄位統一存為字串
+            text_columns = merged_df.select_dtypes(include='object').columns
+            merged_df.astype({col: 'string' for col in text_columns}).to_parquet(
+                parquet_file, compression='snappy', index=False
+            )
+            print(f"💾 保存 Parquet 檔案到: {parquet_file}")
+        except ImportError:
+            print("⚠️ 未安裝 pyarrow，略過 Parquet 輸出")
+        except Exception as e:
+            print(f"⚠️ Parquet 輸出失敗，略過: {e}")
+        
         # 顯示合併後的欄位
         print(f"📋 合併後的欄位 ({len(merged_df.columns)} 個):")
         for i, col in enumerate(merged_df.columns, 1):
@@ -80,7 +94,8 @@ def verify_merged_data():
         return False
     
     try:
-        df = pd.read_csv(output_file)
+        # 讀檔時直接解析日期，不需要再轉換一次整個欄位
+        df = pd.read_csv(output_file, parse_dates=['Date'])
         
         print("\n🔍 數據驗證:")
         print(f"   總行數: {len(df)}")
@@ -89,11 +104,12 @@ def verify_merged_data():
         print(f"   無鯊魚 (has_shark=0): {(df['has_shark'] == 0).sum()} 行")
         
         # 檢查日期範圍
-        df['Date'] = pd.to_datetime(df['Date'])
         print(f"   日期範圍: {df['Date'].min()} 到 {df['Date'].max()}")
         
         # 檢查是否有重複的日期和位置
-        duplicates = df.duplicated(['Date', 'Longitude', 'Latitude']).sum()
+        # 將 (日期, 經度, 緯度) 雜湊成單一整數鍵，一次掃描即可找出重複
+        keys = pd.util.hash_pandas_object(df[['Date', 'Longitude', 'Latitude']], index=False)
+        duplicates = keys.duplicated().sum()
         print(f"   重複記錄: {duplicates} 行")
         
         return True
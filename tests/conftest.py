@@ -0,0 +1,15 @@
+"""
+測試共用的 fixture
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """整個測試階段共用一個客戶端（啟動流程與預先載入只執行一次）"""
+    with TestClient(app) as test_client:
+        yield test_client
@@ -2,15 +2,7 @@
 基本測試範例
 """
 
-import pytest
-from fastapi.testclient import TestClient
-
-from main import app
-
-client = TestClient(app)
-
-
-def test_root_endpoint():
+def test_root_endpoint(client):
     """測試根端點"""
     response = client.get("/")
     assert response.status_code == 200
@@ -19,7 +11,7 @@ def test_root_endpoint():
     assert "NASA Hackathon API" in data["message"]
 
 
-def test_health_check():
+def test_health_check(client):
     """測試健康檢查端點"""
     response = client.get("/health")
     assert response.status_code == 200
@@ -27,7 +19,7 @@ def test_health_check():
     assert data["status"] == "healthy"
 
 
-def test_openapi_docs():
+def test_openapi_docs(client):
     """測試 OpenAPI 文檔端點"""
     response = client.get("/docs")
     assert response.status_code == 200
@@ -36,8 +28,8 @@ def test_openapi_docs():
     assert response.status_code == 200
 
 
-def test_api_v1_prefix():
+def test_api_v1_prefix(client):
     """測試 API v1 前綴存在"""
     response = client.get("/api/v1/")
     # 如果沒有根路由，應該返回 404，這表示前綴設定正確
-    assert response.status_code in [200, 404, 405]
\ No newline at end of file
+    assert response.status_code in [200, 404, 405]
@@ -0,0 +1,134 @@
+"""
+進階 ML 預測路由測試
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.routers.ml_prediction_advanced import (
+    BINARY_MEDIA_TYPE,
+    PredictionBatcher,
+    binary_prediction_response,
+)
+
+
+class RecordingPredict:
+    """假的預測函式：記錄每次呼叫的模型與列數，預測值為第一個特徵，機率為特徵本身"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, model, X):
+        self.calls.append((model, len(X)))
+        if np.isnan(X).any():
+            raise ValueError("特徵含有 NaN")
+        return X[:, 0].astype(int), X.copy()
+
+
+class FakeClassifier:
+    """只提供 classes_ 的假分類器"""
+
+    classes_ = np.array([0, 1, 2])
+
+
+def decode_binary_response(response):
+    """依 X-Shape 與 X-Dtype 標頭將二進位回應內容還原為矩陣"""
+    rows, columns = (int(value) for value in response.headers["X-Shape"].split("x"))
+    return np.frombuffer(response.body, dtype=response.headers["X-Dtype"]).reshape(rows, columns)
+
+
+def run_concurrently(batcher, requests):
+    """在同一個事件迴圈中同時送出多個預測請求，回傳各請求的結果或例外"""
+    async def main():
+        try:
+            return await asyncio.gather(
+                *(batcher.predict(model, X) for model, X in requests),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.close()
+
+    return asyncio.run(main())
+
+
+def test_batcher_returns_each_caller_its_own_rows():
+    """同時到達的請求合併成一次預測，各請求只取回自己的列"""
+    predict = RecordingPredict()
+    batcher = PredictionBatcher(predict=predict)
+    inputs = [np.full((rows, 2), value, dtype=np.float32) for rows, value in [(1, 1), (2, 2), (3, 3)]]
+
+    results = run_concurrently(batcher, [("model", X) for X in inputs])
+
+    assert predict.calls == [("model", 6)]
+    for X, (predictions, probabilities) in zip(inputs, results):
+        np.testing.assert_array_equal(predictions, X[:, 0].astype(int))
+        np.testing.assert_array_equal(probabilities, X)
+
+
+def test_batcher_error_only_fails_offending_request():
+    """批次中某個請求造成錯誤時，只有該請求收到例外"""
+    predict = RecordingPredict()
+    batcher = PredictionBatcher(predict=predict)
+    good = np.ones((2, 2), dtype=np.float32)
+    bad = np.full((1, 2), np.nan, dtype=np.float32)
+
+    results = run_concurrently(batcher, [("model", good), ("model", bad), ("model", good * 2)])
+
+    assert isinstance(results[1], ValueError)
+    np.testing.assert_array_equal(results[0][1], good)
+    np.testing.assert_array_equal(results[2][1], good * 2)
+
+
+def test_batcher_keeps_arrival_order_across_models():
+    """不同模型的請求不合併，且依到達順序處理"""
+    predict = RecordingPredict()
+    batcher = PredictionBatcher(predict=predict)
+    X = np.ones((1, 2), dtype=np.float32)
+
+    results = run_concurrently(batcher, [("a", X), ("b", X), ("a", X)])
+
+    assert [model for model, _ in predict.calls] == ["a", "b", "a"]
+    assert not any(isinstance(result, Exception) for result in results)
+
+
+def test_batcher_close_stops_worker():
+    """關閉後背景工作結束，之後的請求會重新啟動背景工作"""
+    batcher = PredictionBatcher(predict=RecordingPredict())
+    X = np.ones((1, 2), dtype=np.float32)
+
+    async def main():
+        await batcher.predict("model", X)
+        task = batcher._task
+        await batcher.close()
+        assert task.done() and batcher._task is None
+
+        predictions, _ = await batcher.predict("model", X)
+        await batcher.close()
+        return predictions
+
+    np.testing.assert_array_equal(asyncio.run(main()), [1])
+
+
+def test_binary_response_round_trips_probabilities():
+    """有預測機率時回傳 N x 類別數的 float32 矩陣，X-Classes 依模型類別順序"""
+    probabilities = np.array([[0.1, 0.2, 0.7], [0.5, 0.25, 0.25]])
+
+    response = binary_prediction_response(FakeClassifier(), np.array([2, 0]), probabilities)
+
+    assert response.media_type == BINARY_MEDIA_TYPE
+    assert response.headers["X-Shape"] == "2x3"
+    assert response.headers["X-Dtype"] == "<f4"
+    assert response.headers["X-Classes"] == "0,1,2"
+    np.testing.assert_array_equal(decode_binary_response(response), probabilities.astype(np.float32))
+
+
+def test_binary_response_without_probabilities_returns_predictions():
+    """沒有預測機率時回傳 N x 1 的預測值，且不附 X-Classes 標頭"""
+    predictions = np.array([1, 0, 2])
+
+    response = binary_prediction_response(FakeClassifier(), predictions, None)
+
+    assert response.headers["X-Shape"] == "3x1"
+    assert "X-Classes" not in response.headers
+    np.testing.assert_array_equal(decode_binary_response(response), predictions.reshape(-1, 1))
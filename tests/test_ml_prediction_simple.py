@@ -0,0 +1,94 @@
+"""
+簡化版 ML 預測路由測試
+"""
+
+import io
+import queue
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.predictions import predict_with_probabilities
+from app.routers import ml_prediction_simple
+
+
+@pytest.fixture
+def simple_client():
+    """只掛載簡化版 ML 路由的客戶端"""
+    app = FastAPI()
+    app.include_router(ml_prediction_simple.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def empty_buffer_pool():
+    """清空特徵暫存陣列池，回傳池本身"""
+    pool = ml_prediction_simple._feature_buffers
+    while True:
+        try:
+            pool.get_nowait()
+        except queue.Empty:
+            return pool
+
+
+def make_csv(rows: int, columns: int = 13) -> bytes:
+    """產生全為數值的 CSV"""
+    values = np.random.default_rng(0).normal(size=(rows, columns)).round(4)
+    frame = pd.DataFrame(values, columns=[f"f{i}" for i in range(columns)])
+    return frame.to_csv(index=False).encode()
+
+
+def test_iter_csv_features_matches_unchunked():
+    """分塊讀取的特徵與一次讀取整個檔案的特徵相同"""
+    data = make_csv(25)
+
+    chunks = [X.copy() for X, _ in ml_prediction_simple.iter_csv_features(io.BytesIO(data), chunk_rows=10)]
+    expected, _, _ = ml_prediction_simple.prepare_ml_features(pd.read_csv(io.BytesIO(data)))
+
+    assert [len(X) for X in chunks] == [10, 10, 5]
+    np.testing.assert_array_equal(np.concatenate(chunks), expected)
+
+
+def test_predict_spanning_chunks_matches_unchunked(simple_client):
+    """超過 PREDICT_CHUNK_ROWS 列的上傳檔案，預測結果與不分塊預測相同"""
+    rows = ml_prediction_simple.PREDICT_CHUNK_ROWS + 100
+    data = make_csv(rows)
+
+    response = simple_client.post("/predict", files={"file": ("data.csv", data, "text/csv")})
+
+    model, _ = ml_prediction_simple.load_model()
+    X, _, _ = ml_prediction_simple.prepare_ml_features(pd.read_csv(io.BytesIO(data)), model.n_features_in_)
+    expected, probabilities = predict_with_probabilities(model, X)
+
+    assert response.status_code == 200
+    body = response.json()["predictions"]
+    assert body["count"] == rows
+    np.testing.assert_array_equal(body["values"], expected)
+    np.testing.assert_allclose(body["sample_probabilities"], probabilities[:10])
+
+
+def test_buffer_returned_when_iteration_stops(empty_buffer_pool):
+    """產生器提前關閉時，暫存陣列歸還暫存池"""
+    features = ml_prediction_simple.iter_csv_features(io.BytesIO(make_csv(25)), chunk_rows=10)
+    next(features)
+    assert empty_buffer_pool.qsize() == 0
+
+    features.close()
+
+    assert empty_buffer_pool.qsize() == 1
+
+
+def test_buffer_returned_when_prediction_fails(simple_client, empty_buffer_pool, monkeypatch):
+    """預測拋出例外時回傳 500，暫存陣列仍歸還暫存池"""
+    def failing_predict(model, X):
+        raise RuntimeError("模型錯誤")
+
+    monkeypatch.setattr(ml_prediction_simple, "predict_with_probabilities", failing_predict)
+
+    response = simple_client.post("/predict", files={"file": ("data.csv", make_csv(25), "text/csv")})
+
+    assert response.status_code == 500
+    assert empty_buffer_pool.qsize() == 1
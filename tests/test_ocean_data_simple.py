@@ -0,0 +1,58 @@
+"""
+簡化版海洋數據路由測試
+"""
+
+from datetime import date
+
+from app.routers import ocean_data_simple
+
+
+def test_available_dates_empty_csv(tmp_path, monkeypatch):
+    """空的 CSV 檔案回傳空的日期列表"""
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_bytes(b"")
+    monkeypatch.setattr(ocean_data_simple, "AVAILABLE_DATES_CSV", str(csv_path))
+    ocean_data_simple.read_available_dates.cache_clear()
+
+    try:
+        assert ocean_data_simple.load_available_dates() == []
+    finally:
+        ocean_data_simple.read_available_dates.cache_clear()
+
+
+def test_available_dates_sorted_unique(tmp_path, monkeypatch):
+    """日期依第一個欄位擷取，去除重複並排序"""
+    csv_path = tmp_path / "dates.csv"
+    csv_path.write_text("Date,SST_Value\n2014-07-11,1.0\n2014-07-10,2.0\n2014-07-11,3.0\n")
+    monkeypatch.setattr(ocean_data_simple, "AVAILABLE_DATES_CSV", str(csv_path))
+    ocean_data_simple.read_available_dates.cache_clear()
+
+    try:
+        assert ocean_data_simple.load_available_dates() == ["2014-07-10", "2014-07-11"]
+    finally:
+        ocean_data_simple.read_available_dates.cache_clear()
+
+
+def test_modifying_response_does_not_change_cache(tmp_path, monkeypatch):
+    """修改查詢結果不會影響快取，之後的查詢仍回傳原始數據"""
+    csv_path = tmp_path / "ocean.csv"
+    csv_path.write_text(
+        "Date,Longitude,Latitude,SST_Value,CHL_Concentration,SSHA_Value,has_shark\n"
+        "2014-07-10,-90.5,28.0,30.0,0.2,0.1,1\n"
+    )
+    monkeypatch.setattr(ocean_data_simple, "OCEAN_DATA_CSV", str(csv_path))
+    ocean_data_simple.read_records_by_date.cache_clear()
+
+    try:
+        first = ocean_data_simple.build_ocean_data_response(date(2014, 7, 10))
+        first["records"][0]["sst_value"] = None
+        first["records"].clear()
+        first["summary"]["averages"]["sst_value"] = None
+        first["summary"]["total_records"] = 0
+
+        second = ocean_data_simple.build_ocean_data_response(date(2014, 7, 10))
+        assert second["records"][0]["sst_value"] == 30.0
+        assert second["summary"]["averages"]["sst_value"] == 30.0
+        assert second["summary"]["total_records"] == 1
+    finally:
+        ocean_data_simple.read_records_by_date.cache_clear()
@@ -0,0 +1,28 @@
+"""
+預測共用工具測試
+"""
+
+import numpy as np
+import pytest
+
+from app.core.predictions import BINCOUNT_MAX_LABEL, count_predictions
+
+
+@pytest.mark.parametrize("predictions", [
+    np.array([2, 0, 2, 5, 0, 2]),
+    np.array([3, 1, 1], dtype=np.uint8),
+    np.array([-1, 3, -1, 0]),
+    np.array([0, BINCOUNT_MAX_LABEL + 1, 0]),
+    np.array([0.5, 1.0, 0.5, -2.0]),
+    np.array(["shark", "none", "shark"]),
+    np.array([], dtype=np.int64),
+    np.array([], dtype=np.float64),
+], ids=["small-int", "uint8", "negative", "large-label", "float", "string", "empty-int", "empty-float"])
+def test_count_predictions_matches_unique(predictions):
+    """各種輸入的計數結果與 np.unique(..., return_counts=True) 相同（含型別）"""
+    values, counts = count_predictions(predictions)
+    expected_values, expected_counts = np.unique(predictions, return_counts=True)
+
+    assert values.dtype == expected_values.dtype
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(counts, expected_counts)
@@ -0,0 +1,88 @@
+"""
+上傳檔案大小限制測試
+"""
+
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.core.uploads import ensure_upload_size, read_upload
+
+# 可被進階 ML 路由處理的最小 CSV
+SAMPLE_CSV = b"Longitude,Latitude,SST_Value,SST_Gradient\n-90.9,28.0,31.0,0.1\n"
+
+
+class SeekReturnsNone(io.BytesIO):
+    """模擬 Python 3.8 的 SpooledTemporaryFile：seek() 回傳 None"""
+
+    def seek(self, *args):
+        super().seek(*args)
+
+
+def padded_csv(size: int) -> bytes:
+    """以空白行補足到指定大小的 CSV（pandas 會略過空白行）"""
+    return SAMPLE_CSV + b"\n" * (size - len(SAMPLE_CSV))
+
+
+def test_read_upload_at_limit():
+    """大小剛好等於上限的檔案可以完整讀取"""
+    data = padded_csv(settings.MAX_FILE_SIZE)
+
+    assert asyncio.run(read_upload(UploadFile(io.BytesIO(data)))) == data
+
+
+def test_read_upload_over_limit():
+    """超過上限一個位元組的檔案回傳 413"""
+    data = padded_csv(settings.MAX_FILE_SIZE + 1)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(read_upload(UploadFile(io.BytesIO(data))))
+
+    assert exc_info.value.status_code == 413
+
+
+def test_read_upload_checks_streamed_size():
+    """宣告的大小不可信時，讀取過程中累積超過上限也會回傳 413"""
+    upload = UploadFile(io.BytesIO(b"x" * 11), size=5)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(read_upload(upload, max_size=10))
+
+    assert exc_info.value.status_code == 413
+
+
+def test_ensure_upload_size_without_size_attribute():
+    """沒有 size 屬性時以暫存檔長度判斷大小，且不改變讀取位置"""
+    upload = UploadFile(SeekReturnsNone(b"x" * 11))
+    upload.file.seek(3)
+
+    ensure_upload_size(upload, max_size=11)
+    with pytest.raises(HTTPException) as exc_info:
+        ensure_upload_size(upload, max_size=10)
+
+    assert exc_info.value.status_code == 413
+    assert upload.file.tell() == 3
+
+
+def test_predict_upload_at_limit(client):
+    """預測端點接受大小剛好等於上限的檔案"""
+    response = client.post(
+        "/api/v1/ml/predict",
+        files={"file": ("data.csv", padded_csv(settings.MAX_FILE_SIZE), "text/csv")},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["predictions"]["count"] == 1
+
+
+def test_predict_upload_over_limit(client):
+    """預測端點拒絕超過上限一個位元組的檔案（413）"""
+    response = client.post(
+        "/api/v1/ml/predict",
+        files={"file": ("data.csv", padded_csv(settings.MAX_FILE_SIZE + 1), "text/csv")},
+    )
+
+    assert response.status_code == 413